@@ -0,0 +1,129 @@
+import queue
+import random
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from snake_gameAI import SnakeGameAI
+from model import Linear_Qnet
+from agent import Agent, HIDDEN_SIZE
+from state_encoder import STATE_SIZE
+from metrics import MetricsLogger
+from checkpoint import CheckpointManager
+
+# actor/learner training: every actor process plays its own headless game with a copy of the model
+# and streams transitions to the learner, which owns the replay memory and the QTrainer
+SEND_EVERY = 64 # transitions per message to the learner
+SYNC_EVERY = 100 # frames between an actor checking for new weights
+PUBLISH_EVERY = 20 # learner updates between weight broadcasts
+QUEUE_SIZE = 256 # messages waiting for the learner before actors block
+
+def run_actor(actor_id, shared_model, version, lock, games, transitions, stop, seed, cols=None, rows=None):
+    torch.set_num_threads(1) # one core per actor, the learner gets the rest
+    random.seed(seed + actor_id)
+    np.random.seed(seed + actor_id)
+    torch.manual_seed(seed + actor_id)
+
+    agent = Agent()
+    game = SnakeGameAI(render=False, cols=cols, rows=rows)
+    local_version = -1
+    states, actions, rewards, next_states, game_overs, scores = [], [], [], [], [], []
+    frames = 0
+
+    while not stop.is_set():
+        # pick up the newest weights now and then (version only goes up)
+        if frames % SYNC_EVERY == 0 and version.value != local_version:
+            with lock:
+                agent.model.load_state_dict(shared_model.state_dict())
+                local_version = version.value
+        agent.n_games = games.value # epsilon follows the game count of all actors together
+
+        state_old = agent.get_state(game)
+        final_move = agent.get_action(state_old)
+        reward, game_over, score = game.play_step(final_move)
+        state_new = agent.get_state(game)
+        frames += 1
+
+        states.append(state_old)
+        actions.append(np.argmax(final_move))
+        rewards.append(reward)
+        next_states.append(state_new)
+        game_overs.append(game_over)
+
+        if game_over:
+            game.reset()
+            with games.get_lock():
+                games.value += 1
+            scores.append(score)
+
+        if len(rewards) >= SEND_EVERY:
+            msg = (np.array(states, dtype=np.uint8), np.array(actions, dtype=np.int8),
+                   np.array(rewards, dtype=np.float32), np.array(next_states, dtype=np.uint8),
+                   np.array(game_overs, dtype=bool), scores)
+            # don't hang forever on a full queue if the learner is shutting down
+            while not stop.is_set():
+                try:
+                    transitions.put(msg, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+            states, actions, rewards, next_states, game_overs, scores = [], [], [], [], [], []
+
+def train_parallel(num_actors, prioritized=False, max_games=None, seed=0, metrics_path=None, live_plot=True,
+                   cols=None, rows=None):
+    ctx = mp.get_context('spawn') # fresh interpreters, no forked torch threads
+    agent = Agent(prioritized=prioritized) # the learner's agent: memory, trainer and the model being trained
+
+    # weights live in shared memory, version tells the actors when they changed
+    shared_model = Linear_Qnet(STATE_SIZE,HIDDEN_SIZE,3)
+    shared_model.load_state_dict(agent.model.state_dict())
+    shared_model.share_memory()
+    version = ctx.Value('i', 0)
+    lock = ctx.Lock()
+    games = ctx.Value('i', 0)
+    stop = ctx.Event()
+    transitions = ctx.Queue(maxsize=QUEUE_SIZE)
+
+    actors = [ctx.Process(target=run_actor, args=(i, shared_model, version, lock, games, transitions, stop, seed, cols, rows),
+                          daemon=True)
+              for i in range(num_actors)]
+    for p in actors:
+        p.start()
+
+    metrics = MetricsLogger(metrics_path, live_plot=live_plot)
+    checkpoints = CheckpointManager(fresh=True) # no resume here, every run starts its own series
+    record = 0
+    updates = 0
+    try:
+        while max_games is None or agent.n_games < max_games:
+            try:
+                states, actions, rewards, next_states, game_overs, scores = transitions.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            agent.memory.push_batch(states, actions, rewards, next_states, game_overs)
+
+            # one replay batch per message keeps updates in step with how fast data comes in
+            agent.train_long_memory()
+            updates += 1
+            if updates % PUBLISH_EVERY == 0:
+                with lock:
+                    shared_model.load_state_dict(agent.model.state_dict()) # copies into the shared tensors
+                    version.value += 1
+
+            for score in scores:
+                agent.n_games += 1
+                if score > record:
+                    record = score
+                    checkpoints.save(agent, export_model=True, record=record)
+
+                print('Game',agent.n_games,'Score',score,'Record:',record,'Weights v',version.value)
+                metrics.log_game(score, weights_version=version.value)
+    finally:
+        metrics.close()
+        checkpoints.close()
+        stop.set()
+        for p in actors:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+    return agent
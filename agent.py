@@ -1,25 +1,74 @@
+import argparse
+import os
 import torch
 import random
 import numpy as np
-from collections import deque # data struct to store memories
-from snake_gameAI import SnakeGameAI, Direction, Point
-from model import Linear_Qnet, QTrainer
-from helper import plot
+from snake_gameAI import SnakeGameAI, check_board
+from state_encoder import StateEncoder, STATE_SIZE
+from model import Linear_Qnet, QTrainer, NumpyPolicy
+from replay_buffer import ReplayBuffer, PrioritizedReplayBuffer, MappedReplayBuffer
+from transition_log import TransitionLog, TransitionLogWriter
+from qtable import QCache, TabularQ
+from metrics import MetricsLogger, PLOT_EVERY, PLOT_INTERVAL
+from checkpoint import CheckpointManager, load_latest, CHECKPOINT_EVERY
+from episode_trace import TraceRecorder
+from profiler import Profiler, NULL_PROFILER, REPORT_EVERY, PROFILE_START, PROFILE_GAMES
 
 MAX_MEMORY = 100_000 # max 100k in memory
 BATCH_SIZE = 1000
 LR = 0.001 # learning rate alpha
+GAMMA = 0.9 # discount rate bellman eqn (btw 0 and 1, less than 1)
+HIDDEN_SIZE = 256 # neurons in the hidden layer of Linear_Qnet
+EPSILON_START = 80 # random move chance is epsilon/200, epsilon = EPSILON_START - EPSILON_DECAY*n_games
+EPSILON_DECAY = 1
+TRAIN_EVERY = 1 # frames between short memory updates (1 = every frame, like before)
+GRADIENT_STEPS = 1 # optimizer steps per short memory update
+OFFLINE_STEPS = 10_000 # long memory batches for offline training on a log
+TABULAR_LR = 0.1 # learning rate of the tabular Q-learning engine
+# Agent keyword arguments that --hparam and sweeps may set (train() sets the others itself)
+HYPERPARAMS = ('lr', 'gamma', 'batch_size', 'max_memory', 'hidden_size', 'eps_start', 'eps_decay')
 
 class Agent:
 
-    def __init__(self):
+    def __init__(self, prioritized=False, q_cache=False, target_cache_every=0, tabular=False,
+                 target_sync_every=0, tau=0.0, double_dqn=False, max_memory=MAX_MEMORY, batch_size=BATCH_SIZE,
+                 lr=LR, gamma=GAMMA, hidden_size=HIDDEN_SIZE, eps_start=EPSILON_START, eps_decay=EPSILON_DECAY,
+                 seed=None):
+        # q_cache memoizes the model's Q values per state for acting, target_cache_every=N
+        # takes the bellman targets from a per-state cache refreshed every N updates,
+        # tabular swaps the network for exact Q-learning on the 2048 possible states,
+        # target_sync_every/tau/double_dqn set up the trainer's target network,
+        # the rest are the usual hyperparameters (module constants by default, a sweep changes them)
+        check_targets(target_cache_every, target_sync_every, tau, double_dqn)
         # things to store from the get go
         self.n_games = 0
         self.epsilon = 0 # parameter to control the randomness
-        self.gamma = 0.9 # discount rate bellman eqn (btw 0 and 1, less than 1)
-        self.memory = deque(maxlen=MAX_MEMORY) # if we exceed memory it will remove elements from the left
-        self.model  = Linear_Qnet(11,256,3) # state size, hidden layers, and output
-        self.trainer = QTrainer(self.model,lr = LR, gamma = self.gamma)
+        self.eps_start = eps_start
+        self.eps_decay = eps_decay
+        self.gamma = gamma
+        self.batch_size = batch_size
+        # exploration gets its own RNG (from the global one without a seed, so random.seed() still repeats runs)
+        self.rng = random.Random(seed if seed is not None else random.getrandbits(64))
+        # if we exceed memory it will overwrite the oldest elements
+        # prioritized replay samples the surprising transitions (big TD error) more often
+        self.prioritized = prioritized
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(max_memory,STATE_SIZE,seed=seed)
+        else:
+            self.memory = ReplayBuffer(max_memory,STATE_SIZE,seed=seed)
+        self.encoder = StateEncoder()
+        self.model  = Linear_Qnet(STATE_SIZE,hidden_size,3) # state size, hidden layers, and output
+        self.trainer = QTrainer(self.model,lr = lr, gamma = self.gamma, target_sync_every = target_sync_every,
+                                tau = tau, double_dqn = double_dqn)
+        self.policy = NumpyPolicy(self.model) # fast acting path, shares the model's weights
+        if tabular:
+            self.trainer = TabularQ(lr = TABULAR_LR, gamma = self.gamma)
+            self.policy = self.trainer
+        elif q_cache:
+            self.policy = QCache(self.model, self.trainer, refresh_every=1)
+        if target_cache_every > 0 and not tabular:
+            self.trainer.target_cache = QCache(self.model, self.trainer, refresh_every=target_cache_every)
+        self.profiler = NULL_PROFILER # train() swaps in a real one when asked to profile
     
     # for training we create a state --> action --> predict --> compare
     def get_state(self,game):
@@ -27,69 +76,26 @@ class Agent:
         # danger straight, right, left,
         # direction left, right, up, down
         # food left, right, up, down
- 
-        head = game.snake[0]
-        # points next to the head
-        point_l = Point(head.x-20,head.y)
-        point_r = Point(head.x+20,head.y)
-        point_u = Point(head.x,head.y-20)
-        point_d = Point(head.x,head.y+20)
-
-        # get current direction (booleans)
-        dir_l = game.direction == Direction.LEFT
-        dir_r = game.direction == Direction.RIGHT
-        dir_u = game.direction == Direction.UP
-        dir_d = game.direction == Direction.DOWN
-
-        # set up state list
-        state = [
-            # danger straight
-            (dir_r and game.is_collision(point_r)) or
-            (dir_l and game.is_collision(point_l)) or
-            (dir_u and game.is_collision(point_u)) or
-            (dir_d and game.is_collision(point_d)) ,
-
-            # danger right
-            (dir_r and game.is_collision(point_d)) or
-            (dir_l and game.is_collision(point_u)) or
-            (dir_u and game.is_collision(point_r)) or
-            (dir_d and game.is_collision(point_l)) ,
-
-            # danger left
-            (dir_r and game.is_collision(point_u)) or
-            (dir_l and game.is_collision(point_d)) or
-            (dir_u and game.is_collision(point_l)) or
-            (dir_d and game.is_collision(point_r)) ,
-
-            # move direction left, right, up, down
-            dir_l,
-            dir_r,
-            dir_u,
-            dir_d,
-
-            # food location left, right, up, down
-            game.food.x < game.head.x, # food is on the left
-            game.food.x > game.head.x, # food is on the right
-            game.food.y < game.head.y, # food is upwards
-            game.food.y > game.head.y  # food is downwards
-        ]
-
-        # convert booleans to integers and return
-        return np.array(state,dtype=int)
+        # (computed from the game's occupancy grid by the encoder, as float32 ready for the model)
+        return self.encoder.encode(game,np.empty(STATE_SIZE,dtype=np.float32))
 
     def remember(self,state,action,reward,next_state,game_over):
-        # Deque will make sure to pop left if MAX_MEMORY reached
-        self.memory.append((state, action, reward,next_state, game_over))
+        # buffer will make sure to overwrite the oldest if max_memory reached
+        self.memory.push(state, action, reward,next_state, game_over)
 
     def train_long_memory(self):
-        #this one trains with a tensor/batch
-        if len(self.memory) > BATCH_SIZE:
-            mini_sample = random.sample(self.memory,BATCH_SIZE) # list of tuples
-        else:
-            mini_sample = self.memory
-        
+        #this one trains with a tensor/batch (whole memory if we have less than batch_size)
+        if self.prioritized:
+            states,actions,rewards,next_states,game_overs,weights = self.memory.sample(self.batch_size)
+            self.profiler.mark('replay_sample')
+            td_errors = self.trainer.train_step(states,actions,rewards,next_states,game_overs,weights)
+            self.memory.update_priorities(td_errors.numpy())
+            return
+
+        states,actions,rewards,next_states,game_overs = self.memory.sample(self.batch_size)
+        self.profiler.mark('replay_sample')
+
         # train the batch
-        states,actions,rewards,next_states,game_overs = zip(*mini_sample)
         self.trainer.train_step(states,actions,rewards,next_states,game_overs)
 
 
@@ -97,78 +103,308 @@ class Agent:
         #train only current step really
         self.trainer.train_step(state,action,reward,next_state,game_over)
 
+    def train_recent(self,k):
+        # train on the k newest transitions as one mini-batch instead of k batches of 1
+        states,actions,rewards,next_states,game_overs = self.memory.recent(k)
+        td_errors = self.trainer.train_step(states,actions,rewards,next_states,game_overs)
+        if self.prioritized:
+            self.memory.update_priorities(td_errors.numpy())
+
+    def checkpoint_state(self,include_memory=False):
+        # everything needed to pick training back up where it stopped
+        state = {
+            'n_games': self.n_games,
+            'epsilon': self.epsilon,
+            'trainer': self.trainer.state_dict(),
+            'rng': {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state(),
+                    'agent': self.rng.getstate()},
+        }
+        if include_memory:
+            state['memory'] = self.memory.state_dict()
+        return state
+
+    def load_checkpoint_state(self,state):
+        self.n_games = state['n_games']
+        self.epsilon = state['epsilon']
+        self.trainer.load_state_dict(state['trainer'])
+        random.setstate(state['rng']['python'])
+        np.random.set_state(state['rng']['numpy'])
+        torch.set_rng_state(state['rng']['torch'])
+        if 'agent' in state['rng']: # older checkpoints drew exploration from the global RNG
+            self.rng.setstate(state['rng']['agent'])
+        if 'memory' in state:
+            self.memory.load_state_dict(state['memory'])
+
     def get_action(self,state):
         # random moves: tradeoff between exploration and exploitation
-        self.epsilon = 80 - self.n_games # as no of game increase eps decreases (reduces randomness)
+        self.epsilon = self.eps_start - self.eps_decay*self.n_games # as no of game increase eps decreases (reduces randomness)
         final_move = [0,0,0]
 
-        if random.randint(0,200) < self.epsilon: # the smaller eps gets, the less random moves we do
+        if self.rng.randint(0,200) < self.epsilon: # the smaller eps gets, the less random moves we do
             # just a random index on the action [0,0,0]
-            midx = random.randint(0,2)
+            midx = self.rng.randint(0,2)
             final_move[midx] = 1
         else:
             # predict move instead of just going random
-            state0 = torch.tensor(state,dtype = torch.float)
-            prediction = self.model(state0) # needs tensor as input
-            midx = torch.argmax(prediction).item() # gets the idx with the max arg in the move/action
+            # (numpy forward on the model's own weights, no tensors or autograd per frame)
+            midx = self.policy.act_one(state) # gets the idx with the max arg in the move/action
             final_move[midx] = 1
 
         return final_move
 
+    def act(self,states):
+        # greedy action indices for many games at once, e.g. states from StateEncoder.encode_batch
+        return self.policy.act(states)
+
 # global fcn
-def train():
+def train(render=True, render_every=0, prioritized=False, train_every=TRAIN_EVERY, gradient_steps=GRADIENT_STEPS,
+          max_games=None, live_plot=True, save_model=True, metrics_path=None,
+          plot_every=PLOT_EVERY, plot_interval=PLOT_INTERVAL, resume=False, checkpoint_every=CHECKPOINT_EVERY,
+          checkpoint_memory=False, log_dir=None, warm_start=None, q_cache=False, target_cache_every=0, tabular=False,
+          target_sync_every=0, tau=0.0, double_dqn=False, cols=None, rows=None, profile=False,
+          profile_every=REPORT_EVERY, deep_profile=None, profile_start=PROFILE_START, profile_games=PROFILE_GAMES,
+          hyperparams=None, stop_when=None, seed=None, trace_dir=None):
+    # render=False trains headless, render_every=N still shows every Nth game
+    # train_every=K does the short memory update every K frames on those K transitions (gradient_steps times)
+    # max_games stops after that many games (None = keep going), live_plot=False skips the matplotlib plot
+    # metrics_path streams per-game scores to a .csv/.jsonl file, the plot redraws every plot_every games / plot_interval s
+    # save_model=False never writes model.pth or checkpoints (e.g. for benchmarks)
+    # resume=True picks up from the latest checkpoint, checkpoint_memory also puts the replay memory in them
+    # log_dir appends every transition to a binary log there, warm_start fills the memory from such a log first
+    # cols/rows set the board size in cells (default 32x24), the state is the same 11 features on any board
+    # profile=True times every phase of the loop and prints a summary every profile_every s,
+    # deep_profile='cprofile'/'torch' runs games [profile_start, profile_start+profile_games) under that profiler
+    # hyperparams overrides Agent arguments (lr, gamma, batch_size, max_memory, hidden_size, eps_start, eps_decay),
+    # stop_when(n_games, window_mean) is asked after every game and ends training early when it returns True
+    # seed makes the whole run repeatable (game, exploration, torch init), trace_dir saves every new record
+    # as an episode trace there (seed + actions, replay it with episode_trace.py)
     # initialize stuff
-    plot_scores = [] #list to keep track of scores and plot
-    plot_mean_scores = []
-    total_score = 0
+    if seed is not None:
+        torch.manual_seed(seed)
+        np.random.seed(seed)
+    metrics = MetricsLogger(metrics_path, live_plot=live_plot, plot_every=plot_every, plot_interval=plot_interval)
     record = 0
-    agent = Agent()
-    game = SnakeGameAI()
+    agent = Agent(seed=seed,prioritized=prioritized, q_cache=q_cache, target_cache_every=target_cache_every, tabular=tabular,
+                  target_sync_every=target_sync_every, tau=tau, double_dqn=double_dqn, **(hyperparams or {}))
+    game = SnakeGameAI(render=render, cols=cols, rows=rows, seed=None if seed is None else seed+1)
+    recorder = TraceRecorder(game) if trace_dir is not None else None
+    if resume:
+        state = load_latest()
+        if state is not None:
+            agent.load_checkpoint_state(state)
+            record = state.get('record',0)
+            print('Resuming from game',agent.n_games,'Record:',record)
+    if warm_start is not None:
+        agent.memory.load_log(open_log(warm_start))
+        print('Warm start with',len(agent.memory),'transitions from',warm_start)
+    checkpoints = CheckpointManager(include_memory=checkpoint_memory, fresh=not resume) if save_model else None
+    log = TransitionLogWriter(log_dir) if log_dir is not None else None
+    profiler = Profiler(enabled=profile, report_every=profile_every, deep=deep_profile, start=profile_start,
+                        games=profile_games) if profile or deep_profile else NULL_PROFILER
+    agent.profiler = profiler
+    steps_since_update = 0
 
     # start training loop
-    while True:
-        # get the old (current) state
-        state_old = agent.get_state(game)
-
-        # get the move/action based on current state
-        final_move = agent.get_action(state_old)
-
-        # perform move and get new state
-        reward, game_over, score = game.play_step(final_move)
-        state_new = agent.get_state(game)
-
-        # train the short term memory
-        agent.train_short_memory(state_old,final_move,reward,state_new,game_over)
-
-        # remember on memory
-        agent.remember(state_old,final_move,reward,state_new,game_over)
-
-        # if game over
-        if game_over:
-            # train the long memory (experience replay)
-            game.reset()
-            agent.n_games += 1
-            agent.train_long_memory()
-
-            if score > record:
-                record = score
-                # TODO: save the model
-                agent.model.save()
-
-            # print info
-            print('Game',agent.n_games,'Score',score,'Record:',record)
-
-            # plot
-            plot_scores.append(score)
-            total_score += score
-            mean_score = total_score / agent.n_games
-            plot_mean_scores.append(mean_score)
-            plot(plot_scores,plot_mean_scores)
-
-
+    try:
+        profiler.at_game(agent.n_games)
+        profiler.lap()
+        while max_games is None or agent.n_games < max_games:
+            # get the old (current) state
+            state_old = agent.get_state(game)
+            profiler.mark('get_state')
+
+            # get the move/action based on current state
+            final_move = agent.get_action(state_old)
+            if recorder is not None:
+                recorder.add(final_move)
+            profiler.mark('get_action')
+
+            # perform move and get new state
+            reward, game_over, score = game.play_step(final_move)
+            profiler.mark('render' if game.render else 'env_step') # with a window it's mostly drawing + clock tick
+            state_new = agent.get_state(game)
+            profiler.mark('get_state')
+
+            # remember on memory
+            agent.remember(state_old,final_move,reward,state_new,game_over)
+            if log is not None:
+                log.append(state_old,final_move,reward,state_new,game_over)
+            steps_since_update += 1
+            profiler.mark('remember')
+            profiler.count('frames')
+
+            # train the short term memory, every train_every frames and always at the end of a game
+            if steps_since_update >= train_every or game_over:
+                for _ in range(gradient_steps):
+                    agent.train_recent(steps_since_update)
+                steps_since_update = 0
+                profiler.mark('train_short')
+                profiler.count('updates',gradient_steps)
+
+            # if game over
+            if game_over:
+                # train the long memory (experience replay)
+                episode_seed = game.episode_seed
+                game.reset()
+                agent.n_games += 1
+                profiler.mark('env_step')
+                agent.train_long_memory()
+                profiler.mark('train_long')
+                profiler.count('updates')
+                profiler.count('games')
+                if render_every > 0:
+                    game.set_render(render or agent.n_games % render_every == 0)
+
+                if score > record:
+                    record = score
+                    if checkpoints is not None: # written in the background, model.pth included
+                        checkpoints.save(agent,export_model=True,record=record)
+                    if recorder is not None:
+                        recorder.trace(episode_seed,score).save(os.path.join(trace_dir,'record_game%06d_score%d.trace' % (agent.n_games,score)))
+                elif checkpoints is not None and agent.n_games % checkpoint_every == 0:
+                    checkpoints.save(agent,record=record)
+                if recorder is not None:
+                    recorder.clear()
+                profiler.mark('checkpoint')
+
+                # print info
+                print('Game',agent.n_games,'Score',score,'Record:',record)
+
+                # log (and plot, every so often on its own thread)
+                metrics.log_game(score)
+                profiler.mark('metrics')
+                profiler.at_game(agent.n_games)
+                if stop_when is not None and stop_when(agent.n_games, metrics.window_mean()):
+                    break
+
+    finally:
+        profiler.close() # writes an unfinished deep profiling window, prints the totals
+        agent.profiler = NULL_PROFILER
+        metrics.close() # stops the plot thread and flushes the metrics file
+        if checkpoints is not None:
+            checkpoints.close() # lets the last writes finish
+        if log is not None:
+            log.close()
+
+    return agent
+
+def parse_hparams(pairs):
+    # ['lr=0.0005', 'hidden_size=128'] -> {'lr': 0.0005, 'hidden_size': 128}
+    hyperparams = {}
+    for pair in pairs:
+        if '=' not in pair:
+            raise ValueError('expected NAME=VALUE, got %r' % pair)
+        name, value = pair.split('=', 1)
+        hyperparams[name.strip()] = parse_number(value.strip())
+    check_hparams(hyperparams)
+    return hyperparams
+
+def check_hparams(names):
+    # a typo would only show up as a TypeError inside Agent (in every sweep worker), catch it up front
+    unknown = [n for n in names if n not in HYPERPARAMS]
+    if unknown:
+        raise ValueError('unknown hyperparameter %s (choose from %s)' % (', '.join(unknown), ', '.join(HYPERPARAMS)))
+
+def parse_number(value):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+def check_targets(target_cache_every=0, target_sync_every=0, tau=0.0, double_dqn=False):
+    # the bellman target comes from one place: the online model, a target network or the target cache
+    target_network = target_sync_every > 0 or tau > 0
+    if double_dqn and not target_network:
+        raise ValueError('double DQN needs a target network (target_sync_every or tau)')
+    if target_cache_every > 0 and target_network:
+        raise ValueError('the target cache and a target network both set the bellman target, pick one')
+
+def open_log(log_dir):
+    # transition log to learn from, a missing/empty/mistyped folder is an error (not a run on nothing)
+    log = TransitionLog(log_dir)
+    if len(log) == 0:
+        raise ValueError('no transitions in %s' % log_dir)
+    return log
+
+def train_offline(log_dir, steps=OFFLINE_STEPS, save_model=True):
+    # no game at all: long memory batches sampled straight from a memory-mapped transition log
+    log = open_log(log_dir) # before anything could overwrite model.pth
+    agent = Agent()
+    agent.memory = MappedReplayBuffer(log)
+    print('Offline training on',len(agent.memory),'transitions from',log_dir)
+    for step in range(1,steps+1):
+        agent.train_long_memory()
+        if step % 1000 == 0:
+            print('Step',step)
+    if save_model:
+        agent.model.save()
+    return agent
 
 if __name__ == '__main__':
-    train()
+    parser = argparse.ArgumentParser(description='train the snake agent')
+    parser.add_argument('--headless', action='store_true', help='no window, no clock throttling')
+    parser.add_argument('--render-every', type=int, default=0, help='render every Nth game (0 = never when headless)')
+    parser.add_argument('--prioritized', action='store_true', help='prioritized experience replay for the long memory')
+    parser.add_argument('--train-every', type=int, default=TRAIN_EVERY, help='frames between short memory updates')
+    parser.add_argument('--gradient-steps', type=int, default=GRADIENT_STEPS, help='optimizer steps per short memory update')
+    parser.add_argument('--metrics', default=None, help='stream per-game scores to this .csv or .jsonl file')
+    parser.add_argument('--no-plot', action='store_true', help='no live matplotlib plot')
+    parser.add_argument('--plot-every', type=int, default=PLOT_EVERY, help='games between plot redraws')
+    parser.add_argument('--plot-interval', type=float, default=PLOT_INTERVAL, help='seconds between plot redraws')
+    parser.add_argument('--resume', action='store_true', help='continue from the latest checkpoint')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY, help='games between checkpoints')
+    parser.add_argument('--checkpoint-memory', action='store_true', help='also checkpoint the replay memory')
+    parser.add_argument('--log-dir', default=None, help='append every transition to a binary log in this folder')
+    parser.add_argument('--warm-start', default=None, help='fill the replay memory from the transition log in this folder')
+    parser.add_argument('--offline', default=None, help='only train on the transition log in this folder, no game')
+    parser.add_argument('--offline-steps', type=int, default=OFFLINE_STEPS, help='long memory batches for --offline')
+    parser.add_argument('--q-cache', action='store_true', help='memoize Q values per state when acting')
+    parser.add_argument('--target-cache-every', type=int, default=0, help='bellman targets from a per-state Q cache refreshed every N updates (0 = off)')
+    parser.add_argument('--tabular', action='store_true', help='exact tabular Q-learning instead of the network')
+    parser.add_argument('--target-sync-every', type=int, default=0, help='target network, hard copy every N updates (0 = no target network)')
+    parser.add_argument('--tau', type=float, default=0.0, help='target network with polyak averaging at this rate instead')
+    parser.add_argument('--double-dqn', action='store_true', help='double DQN targets (needs a target network)')
+    parser.add_argument('--num-actors', type=int, default=0, help='actor processes feeding one learner (0 = single process loop)')
+    parser.add_argument('--cols', type=int, default=None, help='board width in cells (default 32)')
+    parser.add_argument('--rows', type=int, default=None, help='board height in cells (default 24)')
+    parser.add_argument('--seed', type=int, default=None, help='repeatable run: seeds the game, exploration and torch')
+    parser.add_argument('--trace-dir', default=None, help='save every new record as a replayable episode trace here')
+    parser.add_argument('--hparam', action='append', default=[], metavar='NAME=VALUE',
+                        help='override a hyperparameter (%s)' % ', '.join(HYPERPARAMS))
+    parser.add_argument('--profile', action='store_true', help='time every phase of the loop, print a summary now and then')
+    parser.add_argument('--profile-every', type=float, default=REPORT_EVERY, help='seconds between profile summaries')
+    parser.add_argument('--deep-profile', choices=('cprofile','torch'), default=None, help='run a window of games under this profiler')
+    parser.add_argument('--profile-start', type=int, default=PROFILE_START, help='game the deep profiling window starts at')
+    parser.add_argument('--profile-games', type=int, default=PROFILE_GAMES, help='games in the deep profiling window')
+    args = parser.parse_args()
+    try:
+        check_board(args.cols, args.rows)
+        check_targets(args.target_cache_every, args.target_sync_every, args.tau, args.double_dqn)
+        hyperparams = parse_hparams(args.hparam)
+        for log_dir in (args.offline, args.warm_start):
+            if log_dir is not None:
+                open_log(log_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.offline is not None:
+        train_offline(args.offline, steps=args.offline_steps)
+    elif args.num_actors > 0:
+        from actor_learner import train_parallel
+        train_parallel(args.num_actors, prioritized=args.prioritized, metrics_path=args.metrics, live_plot=not args.no_plot,
+                       cols=args.cols, rows=args.rows)
+    else:
+        train(render=not args.headless, render_every=args.render_every, prioritized=args.prioritized,
+              train_every=args.train_every, gradient_steps=args.gradient_steps, live_plot=not args.no_plot,
+              metrics_path=args.metrics, plot_every=args.plot_every, plot_interval=args.plot_interval,
+              resume=args.resume, checkpoint_every=args.checkpoint_every, checkpoint_memory=args.checkpoint_memory,
+              log_dir=args.log_dir, warm_start=args.warm_start, q_cache=args.q_cache,
+              target_cache_every=args.target_cache_every, tabular=args.tabular,
+              target_sync_every=args.target_sync_every, tau=args.tau, double_dqn=args.double_dqn,
+              cols=args.cols, rows=args.rows, profile=args.profile, profile_every=args.profile_every,
+              deep_profile=args.deep_profile, profile_start=args.profile_start, profile_games=args.profile_games,
+              hyperparams=hyperparams, seed=args.seed, trace_dir=args.trace_dir)
 
 
 
@@ -0,0 +1 @@
+# benchmark suite for the env, agent and trainer hot paths, run it with: python -m bench --help
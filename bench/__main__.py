@@ -0,0 +1,216 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+# the rendered case needs some video driver, fall back to SDL's dummy one on headless boxes
+if not os.environ.get('DISPLAY') and 'SDL_VIDEODRIVER' not in os.environ:
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import numpy as np
+import torch
+from bench.harness import seed_everything, time_calls, time_chunks, time_startup, summarize, environment_info, compare
+from snake_gameAI import SnakeGameAI
+from agent import Agent, train
+from replay_buffer import ReplayBuffer
+from state_encoder import STATE_SIZE, StateEncoder
+from episode_trace import TraceRecorder
+
+MOVES = ([1,0,0], [0,1,0], [0,0,1])
+
+def random_moves(seed, n):
+    # mostly straight, like a half-trained agent, so games last more than a few frames
+    rng = np.random.default_rng(seed)
+    return iter(rng.choice(3, size=n, p=[0.8, 0.1, 0.1]).tolist())
+
+def play_frames(game, moves, n):
+    # get the game into some mid-episode state
+    for _ in range(n):
+        reward, game_over, score = game.play_step(MOVES[next(moves)])
+        if game_over:
+            game.reset()
+
+def bench_env(args, render):
+    seed_everything(args.seed)
+    game = SnakeGameAI(render=render)
+    n_calls = args.scale(40_000) if not render else args.scale(60, minimum=10)
+    moves = random_moves(args.seed, n_calls + 2_000)
+
+    def step():
+        reward, game_over, score = game.play_step(MOVES[next(moves)])
+        if game_over:
+            game.reset()
+
+    if render:
+        return summarize(time_calls(step, n_calls, warmup=5), 'frames/s')
+    return summarize(time_chunks(step, n_calls // 100, 100, warmup=1_000), 'frames/s')
+
+def bench_env_headless(args):
+    return bench_env(args, render=False)
+
+def bench_env_rendered(args):
+    return bench_env(args, render=True)
+
+def bench_get_state(args):
+    seed_everything(args.seed)
+    agent = Agent()
+    game = SnakeGameAI(render=False)
+    play_frames(game, random_moves(args.seed, 50), 50)
+    return summarize(time_calls(lambda: agent.get_state(game), args.scale(50_000), warmup=1_000))
+
+def bench_get_action(args):
+    seed_everything(args.seed)
+    agent = Agent()
+    agent.n_games = 1_000 # epsilon <= 0, so every call goes through the model
+    game = SnakeGameAI(render=False)
+    play_frames(game, random_moves(args.seed, 50), 50)
+    state = agent.get_state(game)
+    return summarize(time_calls(lambda: agent.get_action(state), args.scale(20_000), warmup=500))
+
+def bench_train_step(args, batch_size):
+    seed_everything(args.seed)
+    agent = Agent()
+    rng = np.random.default_rng(args.seed)
+    memory = ReplayBuffer(batch_size, STATE_SIZE, seed=args.seed)
+    memory.push_batch(rng.integers(0, 2, (batch_size, STATE_SIZE)), rng.integers(0, 3, batch_size),
+                      rng.choice([-10, 0, 10], batch_size), rng.integers(0, 2, (batch_size, STATE_SIZE)),
+                      rng.random(batch_size) < 0.05)
+    batch = memory.sample(batch_size)
+    n_calls = args.scale(max(50, 20_000 // batch_size))
+    return summarize(time_calls(lambda: agent.trainer.train_step(*batch), n_calls, warmup=20), 'steps/s')
+
+def bench_train_step_1(args):
+    return bench_train_step(args, 1)
+
+def bench_train_step_32(args):
+    return bench_train_step(args, 32)
+
+def bench_train_step_1000(args):
+    return bench_train_step(args, 1000)
+
+def bench_train_episodes(args):
+    # the whole loop: headless, no plot, no model saving, print output swallowed, seeded through train()
+    # so game, exploration and replay sampling (its own RNG) are the same workload every run
+    seed_everything(args.seed)
+    n_games = args.scale(100, minimum=10)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        train(render=False, max_games=n_games, live_plot=False, save_model=False, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+    return {'n': n_games, 'rate': n_games / elapsed * 3600, 'unit': 'episodes/h', 'seconds': elapsed}
+
+def record_episodes(seed, n):
+    # n seeded episodes of a "don't die" policy (straight unless that is danger, then right, then left),
+    # recorded as traces, so every run replays the exact same frames
+    game = SnakeGameAI(render=False, seed=seed)
+    encoder = StateEncoder()
+    recorder = TraceRecorder(game)
+    traces = []
+    while len(traces) < n:
+        state = encoder.encode(game)
+        move = 0 if not state[0] else 1 if not state[1] else 2
+        recorder.add(move)
+        reward, game_over, score = game.play_step(MOVES[move])
+        if game_over:
+            traces.append(recorder.trace(game.episode_seed, score))
+            recorder.clear()
+            game.reset()
+    return traces
+
+def bench_replay(args):
+    # re-simulating recorded episodes, frames/s of the headless game on an identical workload every run
+    traces = record_episodes(args.seed, args.scale(20, minimum=2))
+    game = SnakeGameAI(render=False)
+    frames = sum(t.replay(game)[1] for t in traces) # warmup, and the frame count
+    t0 = time.perf_counter()
+    for t in traces:
+        t.replay(game)
+    elapsed = time.perf_counter() - t0
+    return {'n': frames, 'rate': frames / elapsed, 'unit': 'frames/s', 'seconds': elapsed}
+
+def bench_startup(args, module):
+    # fresh interpreter + import, e.g. what an evaluation worker costs before it plays its first game
+    times, loaded = time_startup(module, args.scale(10, minimum=3))
+    result = summarize(times, 'starts/s')
+    result['loaded'] = loaded
+    return result
+
+def bench_startup_game(args):
+    return bench_startup(args, 'state_encoder') # game logic + encoder, no UI
+
+def bench_startup_worker(args):
+    return bench_startup(args, 'evaluate')
+
+def bench_startup_agent(args):
+    return bench_startup(args, 'agent')
+
+CASES = {
+    'env_headless': bench_env_headless,
+    'env_rendered': bench_env_rendered,
+    'get_state': bench_get_state,
+    'get_action': bench_get_action,
+    'train_step_1': bench_train_step_1,
+    'train_step_32': bench_train_step_32,
+    'train_step_1000': bench_train_step_1000,
+    'train_episodes': bench_train_episodes,
+    'replay': bench_replay,
+    'startup_game': bench_startup_game,
+    'startup_worker': bench_startup_worker,
+    'startup_agent': bench_startup_agent,
+}
+
+def format_row(name, res):
+    line = '%-16s %14.1f %-11s' % (name, res['rate'], res['unit'])
+    if 'p50_us' in res:
+        line += ' p50 %9.1fus  p90 %9.1fus  p99 %9.1fus' % (res['p50_us'], res['p90_us'], res['p99_us'])
+    if 'loaded' in res:
+        line += '  loads: %s' % (', '.join(res['loaded']) or 'nothing heavy')
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='benchmark the snake env, agent and trainer')
+    parser.add_argument('--cases', default=','.join(CASES), help='comma separated cases to run (default: all)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='10x fewer iterations, for a smoke run')
+    parser.add_argument('--threads', type=int, default=None, help='torch threads (default: torch decides)')
+    parser.add_argument('--json', default=None, help='write results to this file')
+    parser.add_argument('--compare', default=None, help='JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown that counts as a regression (0.10 = 10%%)')
+    args = parser.parse_args(argv)
+
+    names = [c for c in args.cases.split(',') if c]
+    unknown = [c for c in names if c not in CASES]
+    if unknown:
+        parser.error('unknown cases: %s (choose from %s)' % (', '.join(unknown), ', '.join(CASES)))
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    factor = 0.1 if args.quick else 1.0
+    args.scale = lambda n, minimum=1: max(minimum, int(n * factor))
+
+    results = {}
+    for name in names:
+        results[name] = CASES[name](args)
+        print(format_row(name, results[name]), flush=True)
+
+    report = {'meta': environment_info(args.seed), 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline['results'], args.threshold)
+        print('\ncompared to %s (commit %s)' % (args.compare, baseline['meta'].get('commit', '?')))
+        for name, old, new, change in rows:
+            flag = '  <-- regression' if name in regressions else ''
+            print('%-16s %14.1f -> %14.1f  %+6.1f%%%s' % (name, old, new, change * 100, flag))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
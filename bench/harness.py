@@ -0,0 +1,102 @@
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import numpy as np
+import torch
+
+# small timing helpers shared by the benchmark cases
+
+PERCENTILES = (50, 90, 99)
+
+def seed_everything(seed):
+    # same seed for every source of randomness we use, so every run does the same work
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+def time_calls(fn, n, warmup):
+    # time n single calls of fn() (after warmup untimed ones), returns the latencies in seconds
+    for _ in range(warmup):
+        fn()
+    times = np.empty(n)
+    clock = time.perf_counter
+    for i in range(n):
+        t0 = clock()
+        fn()
+        times[i] = clock() - t0
+    return times
+
+def time_chunks(fn, n_chunks, chunk, warmup):
+    # for very cheap calls: time chunks of calls, returns seconds per call for every chunk
+    for _ in range(warmup):
+        fn()
+    times = np.empty(n_chunks)
+    clock = time.perf_counter
+    for i in range(n_chunks):
+        t0 = clock()
+        for _ in range(chunk):
+            fn()
+        times[i] = (clock() - t0) / chunk
+    return times
+
+HEAVY_MODULES = ('torch', 'pygame', 'matplotlib', 'IPython') # what a cold start should only load when needed
+
+def time_startup(module, n):
+    # cold start of a fresh interpreter importing module (what every spawned worker pays),
+    # returns the wall times in seconds and the heavy modules the import pulled in
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = 'import sys, %s; print(",".join(m for m in %r if m in sys.modules))' % (module, HEAVY_MODULES)
+    times = np.empty(n)
+    for i in range(n):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=root, check=True).stdout
+        times[i] = time.perf_counter() - t0
+    return times, [m for m in out.strip().splitlines()[-1].split(',') if m] if out.strip() else []
+
+def summarize(times, unit='calls/s'):
+    # per-call latencies -> throughput plus latency percentiles in microseconds
+    result = {
+        'n': int(len(times)),
+        'rate': float(len(times) / times.sum()),
+        'unit': unit,
+        'mean_us': float(times.mean() * 1e6),
+    }
+    for p in PERCENTILES:
+        result['p%d_us' % p] = float(np.percentile(times, p) * 1e6)
+    return result
+
+def environment_info(seed):
+    # what the numbers were measured on, to make comparing JSON files between commits honest
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+    }
+
+def compare(current, baseline, threshold):
+    # rate changes of every case present in both runs, and the ones that got slower than the threshold
+    rows = []
+    regressions = []
+    for name, res in current.items():
+        old = baseline.get(name)
+        if old is None or not old.get('rate'):
+            continue
+        change = res['rate'] / old['rate'] - 1
+        rows.append((name, old['rate'], res['rate'], change))
+        if change < -threshold:
+            regressions.append(name)
+    return rows, regressions
@@ -0,0 +1,91 @@
+import glob
+import os
+import queue
+import threading
+import torch
+from model import save_atomic
+
+# full training checkpoints (model, adam, agent counters, optionally the replay memory)
+# snapshots are taken on the training thread, written to disk on a background one
+CHECKPOINT_DIR = './model/checkpoints'
+CHECKPOINT_EVERY = 100 # games between periodic checkpoints
+KEEP_LAST = 3 # older checkpoints get deleted
+
+class CheckpointManager:
+
+    def __init__(self, folder=CHECKPOINT_DIR, keep=KEEP_LAST, include_memory=False, model_file='./model/model.pth',
+                 fresh=False):
+        # fresh=True for a run that does not resume: checkpoints of earlier runs in the folder get moved aside,
+        # otherwise pruning by game count would delete the new run's early ones and resume would pick the old run
+        self.folder = folder
+        self.keep = keep
+        self.include_memory = include_memory
+        self.model_file = model_file # plain weights file the rest of the project loads (e.g. evaluate)
+        os.makedirs(self.folder, exist_ok=True)
+        if fresh:
+            rotate(self.folder)
+        self._queue = queue.Queue(maxsize=2) # at most a couple of snapshots waiting, then save() waits
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, agent, export_model=False, **extra):
+        # cheap part here (copies), slow part (serializing + disk) on the writer thread
+        state = agent.checkpoint_state(include_memory=self.include_memory)
+        state.update(extra)
+        self._queue.put((state, export_model))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            state, export_model = item
+            try:
+                path = os.path.join(self.folder, 'ckpt_%08d.pth' % state['n_games'])
+                save_atomic(state, path)
+                if export_model and 'model' in state['trainer']: # tabular agents have no weights file
+                    save_atomic(state['trainer']['model'], self.model_file)
+                self._prune()
+            except Exception as e: # never take the training run down because a write failed
+                print('checkpoint write failed:', e)
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        for path in list_checkpoints(self.folder)[:-self.keep]:
+            os.remove(path)
+
+    def wait(self):
+        # block until everything queued so far is on disk
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+def list_checkpoints(folder=CHECKPOINT_DIR):
+    # oldest first, names carry the game count so sorting by name sorts by progress
+    return sorted(glob.glob(os.path.join(folder, 'ckpt_*.pth')))
+
+def rotate(folder=CHECKPOINT_DIR):
+    # moves the checkpoints in folder into folder/previous_<n> (not listed any more, still there to recover)
+    paths = list_checkpoints(folder)
+    if not paths:
+        return None
+    n = 1
+    while os.path.exists(os.path.join(folder, 'previous_%d' % n)):
+        n += 1
+    target = os.path.join(folder, 'previous_%d' % n)
+    os.makedirs(target)
+    for path in paths:
+        os.replace(path, os.path.join(target, os.path.basename(path)))
+    print('moved %d checkpoints of an earlier run to %s' % (len(paths), target))
+    return target
+
+def load_latest(folder=CHECKPOINT_DIR):
+    # newest checkpoint as a dict, or None if there is nothing to resume from
+    paths = list_checkpoints(folder)
+    if not paths:
+        return None
+    return torch.load(paths[-1], weights_only=False)
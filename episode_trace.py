@@ -0,0 +1,100 @@
+import argparse
+import os
+import struct
+import time
+import numpy as np
+from snake_gameAI import SnakeGameAI
+
+# a whole episode as its seed plus the actions taken, 4 actions per byte: a 1000 frame game is ~280 bytes
+# and replays headless in milliseconds, frames only get drawn when someone wants to watch
+#   header: magic, episode seed (u64), cols, rows (u16), number of actions (u32), final score (i32)
+MAGIC = b'SNKTRC1\0'
+HEADER = struct.Struct('<8sQHHIi')
+TRACE_DIR = './model/traces'
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+def pack_actions(actions):
+    # action indices (0 straight, 1 right, 2 left) -> 2 bits each
+    a = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros(-(-len(a) // 4) * 4, dtype=np.uint8)
+    padded[:len(a)] = a
+    return np.bitwise_or.reduce(padded.reshape(-1, 4) << SHIFTS, axis=1).astype(np.uint8).tobytes()
+
+def unpack_actions(data, n):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return ((packed[:, None] >> SHIFTS) & 3).reshape(-1)[:n]
+
+class EpisodeTrace:
+
+    def __init__(self, seed, actions, cols, rows, score=-1):
+        self.seed = seed
+        self.actions = np.asarray(actions, dtype=np.uint8)
+        self.cols = cols
+        self.rows = rows
+        self.score = score # what the recorded game scored, -1 if unknown
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, self.seed, self.cols, self.rows, len(self.actions), self.score) + pack_actions(self.actions)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, seed, cols, rows, n, score = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('not an episode trace')
+        return cls(seed, unpack_actions(data[HEADER.size:], n), cols, rows, score)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def replay(self, game=None, render=False):
+        # plays the episode again on game (or a fresh one), returns (score, frames, game_over)
+        if game is None:
+            game = SnakeGameAI(render=render, cols=self.cols, rows=self.rows)
+        game.reset(seed=self.seed)
+        score, game_over, frames = 0, False, 0
+        for a in self.actions.tolist():
+            reward, game_over, score = game.play_step(a)
+            frames += 1
+            if game_over:
+                break
+        return score, frames, game_over
+
+class TraceRecorder:
+    # collects the actions of the running episode of a game, turns them into a trace when asked
+
+    def __init__(self, game):
+        self.game = game
+        self.actions = bytearray()
+
+    def add(self, move):
+        # move one-hot like the agent returns it, or an index
+        self.actions.append(move.index(1) if isinstance(move, list) else int(move))
+
+    def trace(self, seed, score=-1):
+        # seed of the episode the actions belong to (read game.episode_seed before the game resets)
+        return EpisodeTrace(seed, np.frombuffer(bytes(self.actions), dtype=np.uint8), self.game.cols, self.game.rows, score)
+
+    def clear(self):
+        self.actions.clear()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='replay a recorded snake episode')
+    parser.add_argument('trace', help='.trace file (e.g. from train --trace-dir)')
+    parser.add_argument('--render', action='store_true', help='watch it instead of only re-simulating')
+    args = parser.parse_args()
+
+    trace = EpisodeTrace.load(args.trace)
+    t0 = time.perf_counter()
+    score, frames, game_over = trace.replay(render=args.render)
+    elapsed = time.perf_counter() - t0
+    print('seed %d on %dx%d: score %d in %d frames (recorded score %d), replayed in %.2f ms' % (
+        trace.seed, trace.cols, trace.rows, score, frames, trace.score, elapsed * 1e3))
+    if trace.score >= 0 and score != trace.score:
+        print('replay does not match the recording')
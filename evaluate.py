@@ -0,0 +1,122 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from snake_gameAI import SnakeGameAI, check_board
+from policy import NumpyPolicy, policy_weights
+from state_encoder import StateEncoder, STATE_SIZE
+
+# greedy, headless evaluation of a saved model: many seeded games over a process pool
+# only the parent loads the model (and torch), workers get the weights as numpy arrays and start fast
+MODEL_FILE = './model/model.pth'
+N_GAMES = 1000
+GAMES_PER_TASK = 50 # games a worker plays per task it gets
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+_policy = None # per worker process
+_encoder = None
+_board = (None, None) # cols, rows every game of this worker is played on
+
+def load_model(path=MODEL_FILE):
+    # layer sizes come from the file, so any hidden size loads
+    import torch
+    from model import Linear_Qnet
+    state_dict = torch.load(path, map_location='cpu')
+    hidden_size, input_size = state_dict['linear1.weight'].shape
+    output_size = state_dict['linear2.weight'].shape[0]
+    model = Linear_Qnet(input_size, hidden_size, output_size)
+    model.load_state_dict(state_dict)
+    return model
+
+def _init_worker(weights, cols=None, rows=None):
+    global _policy, _encoder, _board
+    _policy = NumpyPolicy(weights=weights)
+    _encoder = StateEncoder()
+    _board = (cols, rows)
+
+def play_games(seeds):
+    # one greedy game per seed, returns (score, frames) per game
+    game = SnakeGameAI(render=False, cols=_board[0], rows=_board[1])
+    state = np.zeros(STATE_SIZE, dtype=np.float32)
+    results = []
+    for seed in seeds:
+        game.reset(seed=seed) # food placement is the only randomness in a greedy game
+        frames = 0
+        while True:
+            _encoder.encode(game, state)
+            reward, game_over, score = game.play_step(_policy.act_one(state))
+            frames += 1
+            if game_over:
+                break
+        results.append((score, frames))
+    return results
+
+def distribution(values):
+    values = np.asarray(values)
+    summary = {'mean': float(values.mean()), 'std': float(values.std()), 'min': int(values.min()), 'max': int(values.max())}
+    for p in PERCENTILES:
+        summary['p%d' % p] = float(np.percentile(values, p))
+    return summary
+
+def evaluate(model_path=MODEL_FILE, n_games=N_GAMES, workers=None, seed=0, games_per_task=GAMES_PER_TASK,
+             cols=None, rows=None):
+    # cols/rows play on another board than the default 32x24, e.g. a model trained small evaluated big
+    workers = workers or os.cpu_count()
+    seeds = list(range(seed, seed + n_games)) # game i always gets seed+i, so runs are comparable
+    tasks = [seeds[i:i + games_per_task] for i in range(0, n_games, games_per_task)]
+    board = SnakeGameAI(render=False, cols=cols, rows=rows) # only for the resolved board size
+    weights = policy_weights(load_model(model_path))
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn'), initializer=_init_worker,
+                             initargs=(weights, cols, rows)) as pool:
+        results = [r for chunk in pool.map(play_games, tasks) for r in chunk]
+    elapsed = time.perf_counter() - t0
+
+    scores = [r[0] for r in results]
+    frames = [r[1] for r in results]
+    return {
+        'model': model_path,
+        'games': n_games,
+        'seed': seed,
+        'workers': workers,
+        'board': [board.cols, board.rows],
+        'score': distribution(scores),
+        'game_length': distribution(frames),
+        'seconds': elapsed,
+        'games_per_s': n_games / elapsed,
+        'frames_per_s': sum(frames) / elapsed,
+    }
+
+def print_report(report):
+    print('model %s, %d games (seeds %d..%d) on %dx%d, %d workers' % (report['model'], report['games'], report['seed'],
+          report['seed'] + report['games'] - 1, report['board'][0], report['board'][1], report['workers']))
+    for name in ('score', 'game_length'):
+        d = report[name]
+        print('%-12s mean %8.2f  std %7.2f  min %5d  ' % (name, d['mean'], d['std'], d['min']) +
+              '  '.join('p%d %7.1f' % (p, d['p%d' % p]) for p in PERCENTILES) + '  max %d' % d['max'])
+    print('throughput   %.1f games/s, %.0f frames/s (%.1f s)' % (report['games_per_s'], report['frames_per_s'], report['seconds']))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='evaluate a saved snake model with greedy headless games')
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--games', type=int, default=N_GAMES)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game, game i uses seed+i')
+    parser.add_argument('--json', default=None, help='also write the report to this file')
+    parser.add_argument('--cols', type=int, default=None, help='board width in cells (default 32)')
+    parser.add_argument('--rows', type=int, default=None, help='board height in cells (default 24)')
+    args = parser.parse_args()
+    try:
+        check_board(args.cols, args.rows)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = evaluate(args.model, args.games, args.workers, args.seed, cols=args.cols, rows=args.rows)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,17 +1,32 @@
-import matplotlib.pyplot as plt
-from IPython import display
+plt = None
+display = None
 
-plt.ion()
+def _setup():
+    # matplotlib/IPython only get imported the first time something is plotted
+    global plt, display
+    import matplotlib.pyplot
+    from IPython import display as ipython_display
+    plt = matplotlib.pyplot
+    display = ipython_display
+    plt.ion()
 
-def plot(scores, mean_scores):
+def plot(scores, mean_scores, x=None, last=None):
+    # x are the game numbers of the points (for downsampled series), last = (game, score, mean) to label
+    if plt is None:
+        _setup()
+    if x is None:
+        x = range(len(scores))
+    if last is None:
+        last = (len(scores)-1, scores[-1], mean_scores[-1])
     display.clear_output(wait=True)
     display.display(plt.gcf())
     plt.clf()
     plt.title('Training...')
     plt.xlabel('Number of games')
     plt.ylabel('Score')
-    plt.plot(scores)
-    plt.plot(mean_scores)
+    plt.plot(x, scores)
+    plt.plot(x, mean_scores)
     plt.ylim(ymin = 0)
-    plt.text(len(scores)-1, scores[-1], str(scores[-1])) # plot score val on x y
-    plt.text(len(mean_scores)-1, mean_scores[-1], str(mean_scores[-1])) # plot score val on x y
+    game, score, mean_score = last
+    plt.text(game, scores[-1], str(score)) # plot score val on x y
+    plt.text(game, mean_scores[-1], '%.2f' % mean_score) # plot score val on x y
@@ -0,0 +1,137 @@
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+# cheap per-game metrics: running means kept incrementally, an optional CSV/JSONL stream on disk
+# and an optional live plot: a thread does the downsampling, the main thread only draws what is ready
+# (GUI backends like TkAgg/Qt only work from the main thread), so none of it slows training down
+PLOT_EVERY = 10 # games between plot redraws
+PLOT_INTERVAL = 5.0 # seconds between plot redraws (whichever comes first)
+PLOT_POINTS = 500 # max points drawn per line, longer runs get bucketed
+MEAN_WINDOW = 100 # games in the moving average
+
+def downsample(values, max_points):
+    # average consecutive buckets so the plot stays max_points long, returns (x, y)
+    n = len(values)
+    if n <= max_points:
+        return list(range(n)), list(values)
+    step = n / max_points
+    xs, ys = [], []
+    for i in range(max_points):
+        lo = int(i * step)
+        hi = int((i + 1) * step)
+        bucket = values[lo:hi]
+        xs.append(hi - 1)
+        ys.append(sum(bucket) / len(bucket))
+    return xs, ys
+
+class LivePlot:
+
+    def __init__(self, every=PLOT_EVERY, interval=PLOT_INTERVAL, max_points=PLOT_POINTS):
+        self.every = every
+        self.interval = interval
+        self.max_points = max_points
+        self.scores = []
+        self.mean_scores = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._dirty = False
+        self._ready = None # (scores, mean_scores, x, last) downsampled by the thread, waiting to be drawn
+        self._thread = threading.Thread(target=self._run, name='live-plot', daemon=True)
+        self._thread.start()
+
+    def add(self, score, mean_score):
+        with self._lock:
+            self.scores.append(score)
+            self.mean_scores.append(mean_score)
+            self._dirty = True
+            due = len(self.scores) % self.every == 0
+        if due:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._dirty:
+                    continue
+                self._dirty = False
+                x, scores = downsample(self.scores, self.max_points)
+                _, mean_scores = downsample(self.mean_scores, self.max_points)
+                last = (len(self.scores) - 1, self.scores[-1], self.mean_scores[-1])
+                self._ready = (scores, mean_scores, x, last)
+
+    def draw(self):
+        # main thread only, cheap when nothing new is ready
+        if self._ready is None:
+            return
+        with self._lock:
+            scores, mean_scores, x, last = self._ready
+            self._ready = None
+        from helper import plot # matplotlib only gets imported when we really plot
+        plot(scores, mean_scores, x=x, last=last)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=10)
+        self.draw() # whatever the thread finished last
+
+class MetricsLogger:
+
+    def __init__(self, path=None, window=MEAN_WINDOW, live_plot=False, plot_every=PLOT_EVERY, plot_interval=PLOT_INTERVAL):
+        self.n_games = 0
+        self.total_score = 0
+        self.record = 0
+        self.window = deque(maxlen=window)
+        self.window_sum = 0 # sum of what is in the window, kept up to date instead of re-summing
+        self.plot = LivePlot(plot_every, plot_interval) if live_plot else None
+
+        # stream to disk, format picked from the file name (.csv, anything else is JSON lines)
+        self._file = None
+        self._csv = None
+        if path is not None:
+            self._file = open(path, 'a', buffering=1, newline='')
+            if path.endswith('.csv'):
+                self._csv = csv.writer(self._file)
+                if self._file.tell() == 0:
+                    self._csv.writerow(['game', 'score', 'mean_score', 'window_mean', 'record', 'time'])
+
+    def log_game(self, score, **extra):
+        # call once per finished game, returns the mean score over all games
+        self.n_games += 1
+        self.total_score += score
+        self.record = max(self.record, score)
+        mean_score = self.total_score / self.n_games
+
+        if len(self.window) == self.window.maxlen:
+            self.window_sum -= self.window[0] # about to fall off the left
+        self.window.append(score)
+        self.window_sum += score
+        window_mean = self.window_sum / len(self.window)
+
+        if self._csv is not None:
+            self._csv.writerow([self.n_games, score, mean_score, window_mean, self.record, time.time()])
+        elif self._file is not None:
+            row = {'game': self.n_games, 'score': score, 'mean_score': mean_score,
+                   'window_mean': window_mean, 'record': self.record, 'time': time.time()}
+            row.update(extra)
+            self._file.write(json.dumps(row) + '\n')
+
+        if self.plot is not None:
+            self.plot.add(score, mean_score)
+            self.plot.draw()
+        return mean_score
+
+    def window_mean(self):
+        return self.window_sum / len(self.window) if self.window else 0.0
+
+    def close(self):
+        if self.plot is not None:
+            self.plot.close()
+        if self._file is not None:
+            self._file.close()
@@ -2,7 +2,10 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
+import numpy as np
+import copy
 import os
+from policy import NumpyPolicy # lives in its own module so acting-only processes can skip torch
 
 class Linear_Qnet(nn.Module):
     def __init__(self, input_size, hidden_size, output_size):
@@ -15,27 +18,95 @@ class Linear_Qnet(nn.Module):
         x = self.linear2(x)
         return x
     
+    def predict(self,state):
+        # greedy action index for one state: no autograd, and the input goes into a reused tensor
+        if getattr(self,'_input',None) is None:
+            self._input = torch.zeros(self.linear1.in_features)
+        self._input.copy_(torch.from_numpy(np.asarray(state)))
+        with torch.inference_mode():
+            return int(self(self._input).argmax())
+
+    def act(self,states):
+        # greedy action indices for a batch of states (N, input_size) -> (N,)
+        with torch.inference_mode():
+            return self(torch.as_tensor(np.asarray(states),dtype = torch.float)).argmax(dim=1).numpy()
+
     def save(self,file_name='model.pth'):
         model_folder_path = './model'
         if not os.path.exists(model_folder_path):
             os.makedirs(model_folder_path)
         file_name = os.path.join(model_folder_path,file_name)
-        torch.save(self.state_dict(),file_name)
+        save_atomic(self.state_dict(),file_name)
+
+def save_atomic(obj,file_name):
+    # write next to the target and rename over it, so a crash never leaves a half written file
+    tmp_name = file_name + '.tmp'
+    torch.save(obj,tmp_name)
+    os.replace(tmp_name,file_name)
+
+def _as_tensor(x,dtype):
+    # tensors (e.g. from the replay buffer) only get cast, lists/tuples/arrays get converted once
+    if torch.is_tensor(x):
+        return x.to(dtype)
+    return torch.as_tensor(np.asarray(x),dtype = dtype)
 
 class QTrainer:
-    def __init__(self,model,lr,gamma):
+    def __init__(self,model,lr,gamma,target_sync_every=0,tau=0.0,double_dqn=False):
+        # target network (off by default): hard copy every target_sync_every steps, or
+        # polyak averaging with tau every step; double_dqn picks the next action with the
+        # online model and scores it with the target one
         self.lr = lr
         self.model = model
         self.gamma = gamma
+        self.target_sync_every = target_sync_every
+        self.tau = tau
+        self.double_dqn = double_dqn
+        if double_dqn and not (target_sync_every > 0 or tau > 0):
+            raise ValueError('double DQN needs a target network (target_sync_every or tau)')
+        self.target_model = None
+        if target_sync_every > 0 or tau > 0:
+            self.target_model = copy.deepcopy(model)
+            for p in self.target_model.parameters():
+                p.requires_grad_(False)
         self.optimizer = optim.Adam(model.parameters(),lr = self.lr) # 1st order gradient-based optimization of stochastic fcns
         self.criterion = nn.MSELoss() # mean squared error
+        self.steps = 0 # optimizer steps so far (caches of the model's Q values go by this)
+        self.target_cache = None # optional qtable.QCache to take next state Q values from
+
+    def state_dict(self):
+        # copies (not references) of the weights and the adam state, safe to write out while training goes on
+        state = {'model': copy.deepcopy(self.model.state_dict()),
+                 'optimizer': copy.deepcopy(self.optimizer.state_dict()),
+                 'steps': self.steps}
+        if self.target_model is not None:
+            state['target_model'] = copy.deepcopy(self.target_model.state_dict())
+        return state
+
+    def load_state_dict(self,state):
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.steps = state.get('steps',0)
+        if self.target_model is not None:
+            # older checkpoints have no target, start it from the online weights
+            self.target_model.load_state_dict(state.get('target_model',state['model']))
 
-    def train_step(self,state,action,reward,next_state,game_over):
-        state = torch.tensor(state,dtype = torch.float)
-        action = torch.tensor(action,dtype = torch.long)
-        reward = torch.tensor(reward,dtype = torch.float)
-        next_state = torch.tensor(next_state,dtype = torch.float)
-        # no need to do it for game over because its not even a tensor (0/1 only)
+    def update_target(self):
+        # called after every optimizer step
+        if self.tau > 0:
+            with torch.no_grad():
+                for target_p, p in zip(self.target_model.parameters(),self.model.parameters()):
+                    target_p.lerp_(p,self.tau) # target += tau * (online - target)
+        elif self.steps % self.target_sync_every == 0:
+            self.target_model.load_state_dict(self.model.state_dict())
+
+    def train_step(self,state,action,reward,next_state,game_over,weights=None):
+        # weights are optional per-sample importance-sampling weights (prioritized replay)
+        # returns the absolute TD error of every sample so the replay can update its priorities
+        state = _as_tensor(state,torch.float)
+        action = _as_tensor(action,torch.long)
+        reward = _as_tensor(reward,torch.float)
+        next_state = _as_tensor(next_state,torch.float)
+        game_over = _as_tensor(game_over,torch.float) # 1 where the game ended
 
         if len(state.shape) == 1: # we only have one number
             # we want it was (1,x)... when you have multiple rows you already have it as a (n,x) size
@@ -43,35 +114,56 @@ class QTrainer:
             action = torch.unsqueeze(action,0)
             reward = torch.unsqueeze(reward,0)
             next_state = torch.unsqueeze(next_state,0)
-            game_over = (game_over, )
+            game_over = torch.unsqueeze(game_over,0)
+
+        # actions come in one-hot like [0,1,0] (we just need the index of the 1 on every row)
+        # or already as indices, which is how the replay buffer hands them out
+        if action.dim() == 2:
+            action_idx = torch.argmax(action,dim=1)
+        else:
+            action_idx = action
 
         # 1. we want to get the predicted Q with current state
         # Q = model.predict(state0)
         pred = self.model(state)
-        
+
         # 2. we want to get the new Q given the new state
-        # Qnew = reward + gamma * max(Q(state1))
-        # and we want to update the prediction with this new Q
-        # only do this if not game over yet
-        target = pred.clone()
-        for idx in range(len(game_over)):
-            Q_new = reward[idx] # initialize Q new as just the reward value
-            if not game_over[idx]: # if on that given row it is not game over yet
-                Q_new = reward[idx] + self.gamma * torch.max(self.model(next_state[idx]))
-
-            # upate the prediction with the new target
-            # the idea is that:
-            # 1. you get the index of where your action had a 1, so if [0,0,1], the index is 2
-            # 2. you update the value of Q on that index with the new Q
-            # so if for example you had a [0,1,0] action with a Q of [3,2,1]
-            # and your Q_new was like 4, then it updates to [3,4,1]
-            target[idx][torch.argmax(action).item()] = Q_new #update the working row and the action 1 idx
-        
+        # Qnew = reward + gamma * max(Q(state1)), all rows in one go
+        # and the (1 - game_over) mask drops the future part when the game is over
+        with torch.no_grad():
+            if self.target_cache is not None:
+                next_q = self.target_cache.max_q(next_state) # memoized per packed state
+            elif self.target_model is not None:
+                target_q = self.target_model(next_state)
+                if self.double_dqn:
+                    best = self.model(next_state).argmax(dim=1,keepdim=True)
+                    next_q = target_q.gather(1,best).squeeze(1)
+                else:
+                    next_q = target_q.max(dim=1)[0]
+            else:
+                next_q = self.model(next_state).max(dim=1)[0]
+        Q_new = reward + self.gamma * next_q * (1 - game_over)
+
+        # upate the prediction with the new target
+        # the idea is that on every row you only overwrite the Q of the action taken
+        # so if for example you had a [0,1,0] action with a Q of [3,2,1]
+        # and your Q_new was like 4, then it updates to [3,4,1]
+        target = pred.detach().clone()
+        target[torch.arange(len(action_idx)),action_idx] = Q_new
+
         # 3. initialize and calcualte the loss gradient
         self.optimizer.zero_grad()
-        loss = self.criterion(target,pred)
+        if weights is None:
+            loss = self.criterion(target,pred)
+        else:
+            # same mean squared error, just every row scaled by its weight
+            weights = _as_tensor(weights,torch.float)
+            loss = (weights.unsqueeze(1) * (target - pred) ** 2).mean()
         loss.backward() # backward propagation
 
         self.optimizer.step() # move 1 step on that adam optimizer
+        self.steps += 1
+        if self.target_model is not None:
+            self.update_target()
 
-            
\ No newline at end of file
+        return (Q_new - pred.detach()[torch.arange(len(action_idx)),action_idx]).abs()
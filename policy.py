@@ -0,0 +1,43 @@
+import numpy as np
+
+# acting with a trained Linear_Qnet needs nothing but numpy, so this module doesn't import torch:
+# processes that only play (e.g. evaluation workers) start without paying for it
+
+def policy_weights(model):
+    # (w1, b1, w2, b2) numpy views of a Linear_Qnet's parameters, no copies
+    return (model.linear1.weight.detach().numpy(), model.linear1.bias.detach().numpy(),
+            model.linear2.weight.detach().numpy(), model.linear2.bias.detach().numpy())
+
+class NumpyPolicy:
+    # same forward pass as Linear_Qnet in plain numpy, for acting without any torch overhead
+    # the weight arrays are views of the torch parameters (same memory), so optimizer steps and
+    # load_state_dict show up here straight away, nothing to refresh
+    def __init__(self,model=None,weights=None):
+        # either a Linear_Qnet, or weights=(w1, b1, w2, b2) arrays (e.g. from policy_weights in another process)
+        if model is not None:
+            weights = policy_weights(model)
+        self.w1, self.b1, self.w2, self.b2 = weights # w1 (hidden, input) and w2 (output, hidden), torch layout
+        # buffers for the single state path, so it does not allocate at all
+        self._x = np.zeros(self.w1.shape[1],dtype=np.float32)
+        self._h = np.zeros(self.w1.shape[0],dtype=np.float32)
+        self._q = np.zeros(self.w2.shape[0],dtype=np.float32)
+
+    def q_values(self,states):
+        # (N, input) -> (N, output)
+        h = np.asarray(states,dtype=np.float32) @ self.w1.T
+        h += self.b1
+        np.maximum(h,0,out=h) # relu
+        return h @ self.w2.T + self.b2
+
+    def act(self,states):
+        # greedy action index per state
+        return self.q_values(states).argmax(axis=1)
+
+    def act_one(self,state):
+        self._x[:] = state
+        np.dot(self.w1,self._x,out=self._h)
+        self._h += self.b1
+        np.maximum(self._h,0,out=self._h)
+        np.dot(self.w2,self._h,out=self._q)
+        self._q += self.b2
+        return int(self._q.argmax())
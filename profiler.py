@@ -0,0 +1,129 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+
+# where the time goes in the training loop: lap timers per phase, a few counters, a summary line every so often,
+# and optionally a window of games run under cProfile or torch.profiler with the output written to disk
+# switched off, every hook is an empty method call
+REPORT_EVERY = 30.0 # seconds between summary lines
+PROFILE_DIR = './model/profiles'
+PROFILE_START = 10 # game the deep profiling window starts at (skips the warmup/first games)
+PROFILE_GAMES = 20 # games in the window
+TOP_FUNCTIONS = 40 # rows in the text summaries
+
+class Profiler:
+
+    def __init__(self, enabled=True, report_every=REPORT_EVERY, deep=None, start=PROFILE_START, games=PROFILE_GAMES,
+                 folder=PROFILE_DIR):
+        # deep=None only keeps the timers, 'cprofile' or 'torch' also profiles games [start, start+games)
+        self.enabled = enabled
+        self.report_every = report_every
+        self.deep = deep
+        self.start = start
+        self.games = games
+        self.folder = folder
+        self.totals = {} # phase -> seconds
+        self.calls = {} # phase -> times it was marked
+        self.counters = {} # name -> count
+        self._session = None
+        self._n_games = 0
+        if not enabled:
+            self.lap = self.mark = self.count = self._noop # no clock reads, no dict updates
+            return
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+        self._reported_at = self._t0
+        self._reported = ({}, {}, {}) # totals, counters, calls at the last summary line
+
+    def _noop(self, *args):
+        pass
+
+    def lap(self):
+        # start timing from here, without giving the time since the last mark to any phase
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        # the time since the last lap/mark belongs to phase
+        now = time.perf_counter()
+        self.totals[phase] = self.totals.get(phase, 0.0) + now - self._last
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self._last = now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def at_game(self, n_games):
+        # with the game count, before the first game and after every game: opens/closes the deep profiling window and prints a summary line when it is time
+        self._n_games = n_games
+        if self.deep is not None:
+            if n_games == self.start and self._session is None:
+                self._begin_deep()
+            elif n_games == self.start + self.games and self._session is not None:
+                self._end_deep()
+        if self.enabled and time.perf_counter() - self._reported_at >= self.report_every:
+            print(self.report_line())
+            self._reported = (dict(self.totals), dict(self.counters), dict(self.calls))
+            self._reported_at = time.perf_counter()
+            self._last = self._reported_at # printing is nobody's phase
+
+    def report_line(self, since_start=False):
+        # rates and phase shares since the last line (or over the whole run)
+        now = time.perf_counter()
+        totals, counters, calls = ({}, {}, {}) if since_start else self._reported
+        elapsed = now - (self._t0 if since_start else self._reported_at)
+        phases = {k: v - totals.get(k, 0.0) for k, v in self.totals.items()}
+        counts = {k: v - counters.get(k, 0) for k, v in self.counters.items()}
+        timed = sum(phases.values()) or 1.0
+        parts = ['%.0f %s/s' % (counts[k] / elapsed, k) for k in sorted(counts)]
+        shares = ['%s %.0f%%' % (k, 100 * v / timed) for k, v in sorted(phases.items(), key=lambda kv: -kv[1])]
+        line = '[profile] ' + ', '.join(parts) + ' | ' + ' '.join(shares)
+        samples = self.calls.get('replay_sample', 0) - calls.get('replay_sample', 0)
+        if samples:
+            line += ' | replay sample %.3f ms' % (1e3 * phases['replay_sample'] / samples)
+        return line
+
+    def summary(self):
+        # totals over the whole run, e.g. for a benchmark or a sweep to store
+        return {'seconds': time.perf_counter() - self._t0 if self.enabled else 0.0, 'phases': dict(self.totals),
+                'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def _begin_deep(self):
+        os.makedirs(self.folder, exist_ok=True)
+        if self.deep == 'cprofile':
+            self._session = cProfile.Profile()
+            self._session.enable()
+        elif self.deep == 'torch':
+            import torch.profiler # only needed for this mode
+            self._session = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+            self._session.__enter__()
+        else:
+            raise ValueError('unknown profiler %r (cprofile or torch)' % self.deep)
+        print('[profile] %s on for games %d..%d' % (self.deep, self.start, self.start + self.games - 1))
+
+    def _end_deep(self):
+        name = os.path.join(self.folder, 'train_games_%d-%d' % (self.start, self._n_games - 1))
+        if self.deep == 'cprofile':
+            self._session.disable()
+            self._session.dump_stats(name + '.prof') # for snakeviz / pstats
+            text = io.StringIO()
+            pstats.Stats(self._session, stream=text).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            with open(name + '.txt', 'w') as f:
+                f.write(text.getvalue())
+        else:
+            self._session.__exit__(None, None, None)
+            self._session.export_chrome_trace(name + '.json') # chrome://tracing or perfetto
+            with open(name + '.txt', 'w') as f:
+                f.write(self._session.key_averages().table(sort_by='self_cpu_time_total', row_limit=TOP_FUNCTIONS))
+        self._session = None
+        print('[profile] %s output written to %s.*' % (self.deep, name))
+
+    def close(self):
+        # a window still open when training stops gets written with what it has
+        if self._session is not None:
+            self._end_deep()
+        if self.enabled and self.totals:
+            print(self.report_line(since_start=True))
+
+NULL_PROFILER = Profiler(enabled=False) # what agents use unless train() hands them a real one
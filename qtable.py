@@ -0,0 +1,125 @@
+import numpy as np
+import torch
+from model import NumpyPolicy
+from state_encoder import STATE_SIZE, pack_states
+
+# the agent state is 11 bits, so there are only 2048 states: Q values can be looked up in a table
+# instead of running the MLP every time (QCache), or learned directly as a table (TabularQ)
+N_STATES = 2 ** STATE_SIZE
+N_ACTIONS = 3
+
+class QCache:
+
+    # Q values of the model memoized per packed state
+    # refresh_every=1 drops the table after every optimizer step of the trainer and fills rows as states show up
+    # (exact for acting), bigger values recompute every row at once and keep them for that many steps
+    # (a frozen target, e.g. for the bellman update)
+    def __init__(self, model, trainer=None, refresh_every=1):
+        self.policy = NumpyPolicy(model)
+        self.trainer = trainer
+        self.refresh_every = refresh_every
+        self.table = np.zeros((N_STATES, N_ACTIONS), dtype=np.float32)
+        self.valid = np.zeros(N_STATES, dtype=bool)
+        self.all_states = ((np.arange(N_STATES)[:,None] >> np.arange(STATE_SIZE)) & 1).astype(np.float32)
+        self.synced_at = 0 # trainer step the table belongs to
+        self.hits = 0
+        self.misses = 0
+        if refresh_every > 1:
+            self.refresh()
+
+    def refresh(self):
+        # all 2048 rows from the weights as they are now (one small matmul), a consistent frozen snapshot
+        self.table[:] = self.policy.q_values(self.all_states)
+        self.valid[:] = True
+
+    def invalidate(self):
+        # e.g. after load_state_dict, which the trainer step count does not see
+        # the acting cache refills lazily, a frozen target has to be one weight version so it is rebuilt whole
+        if self.refresh_every > 1:
+            self.refresh()
+        else:
+            self.valid[:] = False
+
+    def _sync(self):
+        if self.trainer is not None and self.trainer.steps - self.synced_at >= self.refresh_every:
+            self.invalidate()
+            self.synced_at = self.trainer.steps
+
+    def lookup(self, packed):
+        # Q values (N, 3) for packed states, only the states not seen since the last refresh get a forward pass
+        # (never happens for a frozen target, its rows are all filled on refresh)
+        self._sync()
+        packed = np.asarray(packed, dtype=np.int64)
+        missing = packed[~self.valid[packed]]
+        if len(missing):
+            missing = np.unique(missing)
+            self.table[missing] = self.policy.q_values(self.all_states[missing])
+            self.valid[missing] = True
+        self.misses += len(missing)
+        self.hits += len(packed) - len(missing)
+        return self.table[packed]
+
+    def max_q(self, states):
+        # max over actions for a batch of states (tensor or array), as a tensor for the trainer
+        return torch.from_numpy(self.lookup(pack_states(np.asarray(states))).max(axis=1))
+
+    def act_one(self, state):
+        self._sync()
+        s = int(pack_states(state))
+        if not self.valid[s]:
+            self.table[s] = self.policy.q_values(self.all_states[s:s+1])[0]
+            self.valid[s] = True
+            self.misses += 1
+        else:
+            self.hits += 1
+        return int(self.table[s].argmax())
+
+    def act(self, states):
+        return self.lookup(pack_states(states)).argmax(axis=1)
+
+class TabularQ:
+
+    # plain Q-learning on a 2048 x 3 table, same train_step/act interface as QTrainer + NumpyPolicy,
+    # so the agent can use it as its trainer and its policy
+    def __init__(self, lr=0.1, gamma=0.9):
+        self.lr = lr
+        self.gamma = gamma
+        self.q = np.zeros((N_STATES, N_ACTIONS), dtype=np.float32)
+        self.steps = 0
+
+    def train_step(self, state, action, reward, next_state, game_over, weights=None):
+        s = np.atleast_1d(pack_states(np.asarray(state))).astype(np.int64)
+        s2 = np.atleast_1d(pack_states(np.asarray(next_state))).astype(np.int64)
+        action = np.asarray(action)
+        if action.ndim == 2 or (action.ndim == 1 and len(s) == 1 and len(action) == N_ACTIONS):
+            a = np.atleast_2d(action).argmax(axis=1) # one-hot rows
+        else:
+            a = np.atleast_1d(action).astype(np.int64)
+        reward = np.atleast_1d(np.asarray(reward, dtype=np.float32))
+        done = np.atleast_1d(np.asarray(game_over, dtype=np.float32))
+
+        # Q(s,a) += lr * (r + gamma * max Q(s') - Q(s,a))
+        # a batch often holds the same (s,a) many times, those get one step with their mean TD error
+        target = reward + self.gamma * self.q[s2].max(axis=1) * (1 - done)
+        td = target - self.q[s, a]
+        step = td if weights is None else td * np.asarray(weights, dtype=np.float32)
+        keys = s * N_ACTIONS + a
+        sums = np.bincount(keys, weights=step, minlength=N_STATES*N_ACTIONS)
+        counts = np.bincount(keys, minlength=N_STATES*N_ACTIONS)
+        seen = np.flatnonzero(counts)
+        self.q.reshape(-1)[seen] += self.lr * (sums[seen] / counts[seen])
+        self.steps += 1
+        return torch.from_numpy(np.abs(td))
+
+    def act_one(self, state):
+        return int(self.q[int(pack_states(state))].argmax())
+
+    def act(self, states):
+        return self.q[pack_states(states)].argmax(axis=1)
+
+    def state_dict(self):
+        return {'q': self.q.copy(), 'steps': self.steps}
+
+    def load_state_dict(self, state):
+        self.q[:] = state['q']
+        self.steps = state['steps']
@@ -0,0 +1,209 @@
+import random
+import numpy as np
+import torch
+from transition_log import unpack_records
+
+# ring buffer of transitions kept in preallocated arrays instead of a deque of tuples
+# states are 0/1 features so uint8 is plenty, actions are stored as the index of the 1
+
+class ReplayBuffer:
+
+    def __init__(self, capacity, state_size, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.uint8)
+        self.game_overs = np.zeros(capacity, dtype=bool)
+        self.pos = 0 # next slot to write, wraps around once we are full (oldest gets overwritten)
+        self.size = 0
+        self.rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64)) # random.seed() repeats runs
+
+    def __len__(self):
+        return self.size
+
+    def push(self, state, action, reward, next_state, game_over):
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = np.argmax(action) # one-hot [0,1,0] -> 1
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.game_overs[i] = game_over
+        self.pos = (self.pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, game_overs):
+        # many transitions at once (actions already as indices), wraps around the ring like push
+        k = len(rewards)
+        idx = (self.pos + np.arange(k)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.game_overs[idx] = game_overs
+        self.pos = (self.pos + k) % self.capacity
+        self.size = min(self.size + k, self.capacity)
+        return idx
+
+    def state_dict(self):
+        # copies of the filled part only, so an almost empty buffer makes a small checkpoint
+        n = self.size
+        return {'states': self.states[:n].copy(), 'actions': self.actions[:n].copy(),
+                'rewards': self.rewards[:n].copy(), 'next_states': self.next_states[:n].copy(),
+                'game_overs': self.game_overs[:n].copy(), 'pos': self.pos, 'size': self.size}
+
+    def load_state_dict(self, state):
+        n = state['size']
+        self.states[:n] = state['states']
+        self.actions[:n] = state['actions']
+        self.rewards[:n] = state['rewards']
+        self.next_states[:n] = state['next_states']
+        self.game_overs[:n] = state['game_overs']
+        self.pos = state['pos']
+        self.size = n
+
+    def load_log(self, log):
+        # warm start from a TransitionLog: the newest transitions that fit, read straight off the memory map
+        self.push_batch(*unpack_records(log.tail(self.capacity)))
+
+    def sample(self, batch_size):
+        # random batch without repeats, or everything we have if there is not enough yet
+        if self.size > batch_size:
+            idx = self.rng.choice(self.size, batch_size, replace=False)
+        else:
+            idx = np.arange(self.size)
+        return self._gather(idx)
+
+    def recent(self, k):
+        # the k newest transitions, oldest first (for training on what just happened)
+        k = min(k, self.size)
+        idx = (self.pos - k + np.arange(k)) % self.capacity
+        return self._gather(idx)
+
+    def _gather(self, idx):
+        # one fancy-index copy per field, torch.from_numpy then shares that memory
+        self.last_idx = idx # remember which rows went out, e.g. to update their priorities
+        return (torch.from_numpy(self.states[idx]),
+                torch.from_numpy(self.actions[idx].astype(np.int64)),
+                torch.from_numpy(self.rewards[idx]),
+                torch.from_numpy(self.next_states[idx]),
+                torch.from_numpy(self.game_overs[idx]))
+
+# read-only replay straight from a memory-mapped TransitionLog, for offline training
+# on datasets bigger than RAM (only the sampled records get paged in)
+class MappedReplayBuffer:
+
+    def __init__(self, log, seed=None):
+        self.log = log
+        self.rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+
+    def __len__(self):
+        return len(self.log)
+
+    def sample(self, batch_size):
+        n = len(self.log)
+        if n > batch_size:
+            idx = np.sort(self.rng.choice(n, batch_size, replace=False)) # sorted reads are kinder to the page cache
+        else:
+            idx = np.arange(n)
+        self.last_idx = idx
+        return tuple(torch.from_numpy(a) for a in unpack_records(self.log.records(idx)))
+
+# binary tree where every parent holds the sum of its children, leaves are the priorities
+# so sampling proportional to priority and updating a priority are both O(log n)
+class SumTree:
+
+    def __init__(self, capacity):
+        self.n_leaves = 1
+        while self.n_leaves < capacity:
+            self.n_leaves *= 2
+        self.tree = np.zeros(2*self.n_leaves, dtype=np.float64) # tree[1] is the root, leaves start at n_leaves
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, idx, priorities):
+        # set the leaves and walk every touched path up to the root, one level at a time for the whole batch
+        nodes = np.asarray(idx, dtype=np.int64) + self.n_leaves
+        if len(nodes) == 0:
+            return
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2*nodes] + self.tree[2*nodes+1]
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        # go down from the root: left if the value fits in the left sum, otherwise subtract it and go right
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        while nodes[0] < self.n_leaves:
+            left = 2*nodes
+            go_right = values > self.tree[left]
+            values -= np.where(go_right, self.tree[left], 0.0)
+            nodes = left + go_right
+        return nodes - self.n_leaves
+
+# replay buffer that samples transitions proportional to their last TD error (Schaul et al. 2015)
+# alpha sets how much the priorities count (0 = uniform), beta the importance-sampling correction
+class PrioritizedReplayBuffer(ReplayBuffer):
+
+    def __init__(self, capacity, state_size, alpha=0.6, beta=0.4, beta_increment=1e-3, eps=1e-3, seed=None):
+        super().__init__(capacity, state_size, seed=seed)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment # beta goes up to 1 as training goes on
+        self.eps = eps # keeps zero-error transitions sampleable
+        self.max_priority = 1.0
+
+    def push(self, state, action, reward, next_state, game_over):
+        i = self.pos
+        super().push(state, action, reward, next_state, game_over)
+        # new transitions get the highest priority so they are seen at least once
+        self.tree.update([i], [self.max_priority])
+
+    def push_batch(self, states, actions, rewards, next_states, game_overs):
+        idx = super().push_batch(states, actions, rewards, next_states, game_overs)
+        self.tree.update(idx, np.full(len(idx), self.max_priority))
+        return idx
+
+    def state_dict(self):
+        state = super().state_dict()
+        state['priorities'] = self.tree.tree[self.tree.n_leaves:self.tree.n_leaves+self.size].copy()
+        state['max_priority'] = self.max_priority
+        state['beta'] = self.beta
+        return state
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        if 'priorities' in state: # plain buffer checkpoints just start everything at max priority
+            self.tree.update(np.arange(self.size), state['priorities'])
+            self.max_priority = state['max_priority']
+            self.beta = state['beta']
+        else:
+            self.tree.update(np.arange(self.size), np.full(self.size, self.max_priority))
+
+    def sample(self, batch_size):
+        # one value per equal slice of the total priority mass (stratified), like the paper
+        n = min(batch_size, self.size)
+        total = self.tree.total()
+        bounds = np.linspace(0, total, n+1)
+        values = self.rng.uniform(bounds[:-1], bounds[1:])
+        idx = np.minimum(self.tree.find(values), self.size-1)
+
+        # importance-sampling weights undo the bias of not sampling uniformly, scaled so the max is 1
+        probs = self.tree.tree[idx + self.tree.n_leaves] / total
+        weights = (self.size * probs) ** (-self.beta)
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return self._gather(idx) + (torch.from_numpy(weights.astype(np.float32)),)
+
+    def update_priorities(self, td_errors, idx=None):
+        idx = self.last_idx if idx is None else idx
+        priorities = (np.abs(np.asarray(td_errors, dtype=np.float64)) + self.eps) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, priorities.max())
@@ -0,0 +1,292 @@
+import argparse
+import json
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+from policy import NumpyPolicy, policy_weights
+from state_encoder import StateEncoder, STATE_SIZE, unpack_states
+
+# a trained model as a local policy service: clients send states over TCP, one JSON object per line,
+# a batcher thread coalesces what arrives within a short window into one forward pass
+#   {"state": [11 x 0/1]}                          -> {"action": 1, "move": [0,1,0]}
+#   {"states": [[...], ...]}                       -> {"actions": [...]}
+#   {"packed": 1234} / {"packed": [...]}           -> same, states packed as 11 bits (see pack_states)
+#   {"board": {"cols": 32, "rows": 24, "snake": [[x,y], ...], "food": [x,y], "direction": "RIGHT"}}
+#   {"cmd": "stats"}                               -> latency percentiles and throughput
+HOST = '127.0.0.1'
+PORT = 5050
+MODEL_FILE = './model/model.pth'
+MAX_BATCH = 256 # states per forward pass
+MAX_DELAY = 0.002 # seconds the batcher waits for requests already submitted to reach the queue
+LATENCY_WINDOW = 100_000 # latest request latencies kept for the percentiles
+MOVES = ([1,0,0], [0,1,0], [0,0,1])
+
+class Pending:
+    # one request waiting for the batcher
+    __slots__ = ('states', 'actions', 'done')
+
+    def __init__(self, states):
+        self.states = states
+        self.actions = None
+        self.done = threading.Event()
+
+class Batcher:
+
+    def __init__(self, policy, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.states = 0
+        self.batches = 0
+        self.in_flight = 0 # submitted and not answered yet (idle connections don't count, nobody waits for them)
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='policy-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, states):
+        # (k, 11) states -> k action indices, blocks until the batch it ended up in has run
+        t0 = time.perf_counter()
+        item = Pending(states)
+        with self._lock:
+            self.in_flight += 1
+        self._queue.put(item)
+        item.done.wait()
+        latency = time.perf_counter() - t0
+        with self._lock:
+            self.latencies.append(latency)
+            self.requests += 1
+            self.states += len(states)
+        return item.actions
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            # keep taking requests until the batch is full, every request in flight is in, or the window
+            # since the first one is over; clients that have nothing pending are not waited for
+            batch = [item]
+            n = len(item.states)
+            deadline = time.perf_counter() + self.max_delay
+            while n < self.max_batch and len(batch) < self.in_flight:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None) # finish this batch, stop on the next round
+                    break
+                batch.append(item)
+                n += len(item.states)
+
+            states = batch[0].states if len(batch) == 1 else np.concatenate([b.states for b in batch])
+            actions = self.policy.act(states).tolist()
+            with self._lock:
+                self.in_flight -= len(batch) # before done is set, so the next round never waits on these
+            start = 0
+            for b in batch:
+                b.actions = actions[start:start + len(b.states)]
+                start += len(b.states)
+                b.done.set()
+            self.batches += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            requests, states = self.requests, self.states
+        elapsed = time.perf_counter() - self.started
+        result = {'requests': requests, 'states': states, 'batches': self.batches,
+                  'mean_batch': states / self.batches if self.batches else 0.0,
+                  'requests_per_s': requests / elapsed, 'states_per_s': states / elapsed}
+        if len(latencies):
+            result['p50_ms'] = float(np.percentile(latencies, 50) * 1e3)
+            result['p99_ms'] = float(np.percentile(latencies, 99) * 1e3)
+        return result
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+class PolicyHandler(socketserver.StreamRequestHandler):
+    # one thread per client connection, every line is a request
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # tiny messages, no nagle delay
+        self.encoder = StateEncoder()
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.answer(json.loads(line))
+            except (ValueError, KeyError, TypeError, IndexError, OverflowError) as e:
+                reply = {'error': '%s: %s' % (type(e).__name__, e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+    def answer(self, request):
+        batcher = self.server.batcher
+        if not isinstance(request, dict):
+            raise TypeError('a request is a JSON object, got %s' % type(request).__name__)
+        if request.get('cmd') == 'stats':
+            return batcher.stats()
+        if 'board' in request:
+            b = request['board']
+            state = self.encoder.encode_snapshot(b['snake'], b['food'], b['direction'], b['cols'], b['rows'],
+                                                 np.empty(STATE_SIZE, dtype=np.float32))
+            states, single = state[None], True
+        elif 'packed' in request:
+            packed = np.asarray(request['packed'], dtype=np.int64)
+            if np.any((packed < 0) | (packed >= 1 << STATE_SIZE)):
+                raise ValueError('packed states go from 0 to %d' % ((1 << STATE_SIZE) - 1))
+            single = packed.ndim == 0
+            states = np.atleast_2d(unpack_states(packed)).astype(np.float32)
+        elif 'state' in request:
+            states, single = np.asarray([request['state']], dtype=np.float32), True
+        else:
+            states, single = np.asarray(request['states'], dtype=np.float32).reshape(-1, STATE_SIZE), False
+        if states.shape[1] != STATE_SIZE:
+            raise ValueError('states need %d features' % STATE_SIZE)
+        actions = batcher.submit(states)
+        if single:
+            return {'action': actions[0], 'move': MOVES[actions[0]]}
+        return {'actions': actions}
+
+class PolicyServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, policy, host=HOST, port=PORT, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        super().__init__((host, port), PolicyHandler)
+        self.batcher = Batcher(policy, max_batch, max_delay)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+class PolicyClient:
+    # blocking client, one request in flight per connection (use one client per game thread)
+
+    def __init__(self, host=HOST, port=PORT):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile('rb')
+
+    def request(self, payload):
+        self.sock.sendall(json.dumps(payload).encode() + b'\n')
+        reply = json.loads(self.file.readline())
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+        return reply
+
+    def act(self, state):
+        return self.request({'state': np.asarray(state).astype(int).tolist()})['action']
+
+    def act_batch(self, states):
+        return self.request({'states': np.asarray(states).astype(int).tolist()})['actions']
+
+    def act_board(self, snake, food, direction, cols, rows):
+        return self.request({'board': {'snake': snake, 'food': food, 'direction': direction,
+                                       'cols': cols, 'rows': rows}})['action']
+
+    def stats(self):
+        return self.request({'cmd': 'stats'})
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+def load_policy(model_path=MODEL_FILE):
+    # torch is only needed to read the file, serving runs on numpy copies of the weights
+    from evaluate import load_model
+    return NumpyPolicy(weights=tuple(w.copy() for w in policy_weights(load_model(model_path))))
+
+def load_test(n_clients, seconds, host=HOST, port=PORT):
+    # n_clients threads each play headless games through the service, returns the client side numbers
+    from snake_gameAI import SnakeGameAI
+    stop = threading.Event()
+    latencies = []
+    lock = threading.Lock()
+
+    def play(i):
+        client = PolicyClient(host, port)
+        game = SnakeGameAI(render=False)
+        encoder = StateEncoder()
+        own = []
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            action = client.act(encoder.encode(game))
+            own.append(time.perf_counter() - t0)
+            reward, game_over, score = game.play_step(MOVES[action])
+            if game_over:
+                game.reset()
+        client.close()
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=play, args=(i,), daemon=True) for i in range(n_clients)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies = np.array(latencies)
+    return {'clients': n_clients, 'requests': len(latencies), 'requests_per_s': len(latencies) / seconds,
+            'p50_ms': float(np.percentile(latencies, 50) * 1e3), 'p99_ms': float(np.percentile(latencies, 99) * 1e3)}
+
+def print_stats(name, stats):
+    line = '%-7s %d requests, %.0f requests/s' % (name, stats['requests'], stats['requests_per_s'])
+    if 'mean_batch' in stats:
+        line += ', %d batches (mean %.1f states)' % (stats['batches'], stats['mean_batch'])
+    if 'p50_ms' in stats:
+        line += ', latency p50 %.3f ms p99 %.3f ms' % (stats['p50_ms'], stats['p99_ms'])
+    print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='serve a saved snake model to game clients over TCP')
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='states per forward pass')
+    parser.add_argument('--max-delay', type=float, default=MAX_DELAY * 1e3, help='ms a batch waits for requests still on their way in (idle clients are never waited for)')
+    parser.add_argument('--stats-every', type=float, default=10.0, help='seconds between stats lines (0 = never)')
+    parser.add_argument('--load-test', type=int, default=0, help='instead of serving, hit a running server with this many game clients')
+    parser.add_argument('--seconds', type=float, default=10.0, help='length of the load test')
+    args = parser.parse_args()
+
+    if args.load_test:
+        print_stats('clients', load_test(args.load_test, args.seconds, args.host, args.port))
+        client = PolicyClient(args.host, args.port)
+        print_stats('server', client.stats())
+        client.close()
+    else:
+        server = PolicyServer(load_policy(args.model), args.host, args.port, args.max_batch, args.max_delay / 1e3)
+        print('serving %s on %s:%d' % (args.model, args.host, args.port), flush=True)
+        if args.stats_every > 0:
+            def report():
+                while True:
+                    time.sleep(args.stats_every)
+                    if server.batcher.requests:
+                        print_stats('server', server.batcher.stats())
+                        sys.stdout.flush()
+            threading.Thread(target=report, daemon=True).start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -1,10 +1,19 @@
-import pygame
 import random
 from enum import Enum
-from collections import namedtuple
+from collections import namedtuple, deque
+from itertools import islice
 import numpy as np
-pygame.init()
-font = pygame.font.Font('arial.ttf',25) # much faster to get font from ttf than from system
+pygame = None # imported and initialized when the first window opens, headless runs never load it
+font = None # loaded on first draw, headless runs never touch it
+
+def _load_pygame():
+    # only the window, events and drawing need pygame, the game logic doesn't
+    global pygame
+    if pygame is None:
+        import pygame as pg
+        pg.init()
+        pygame = pg
+    return pygame
 
 class Direction(Enum):
     RIGHT = 1
@@ -14,9 +23,23 @@ class Direction(Enum):
 
 Point = namedtuple('Point','x, y') # lightweight class, only 2 variables are input, is a string separated by commas
 
-BLOCK_SIZE = 20
+# the game core only uses integer codes: directions clockwise from right, so a right turn is +1 and a left turn -1
+RIGHT, DOWN, LEFT, UP = range(4)
+DX = (1, 0, -1, 0) # cell step per direction code
+DY = (0, 1, 0, -1)
+TURNS = (0, 1, 3) # action index (0 straight, 1 right, 2 left) -> added to the direction code, mod 4
+DIRECTIONS = (Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP) # code -> enum, for the old API
+DIRECTION_CODE = {d: i for i, d in enumerate(DIRECTIONS)}
+
+BLOCK_SIZE = 20 # pixels per cell on screen, the game itself only works in cells
+MAX_WINDOW = (1280, 960) # big boards get smaller blocks so the window still fits
 SPEED = 15
+FOOD_TRIES = 8 # random food draws before falling back to picking from the free cells
 BEDGE = 4 # size of block edge
+FRAMES_PER_SEGMENT = 100 # frame cap per snake block on the default board, before a game counts as stuck
+DEFAULT_CELLS = (640//BLOCK_SIZE)*(480//BLOCK_SIZE) # the 32x24 board everything was tuned on
+MIN_COLS = 4 # the starting snake is 3 cells of one row, head at cols//2 with 2 cells on its left
+MIN_ROWS = 1
 
 #RGB colors
 WHITE = (255, 255, 255)
@@ -29,44 +52,195 @@ BLACK = (0,0,0)
 # 1. input is instead of user, an action of straight, left, or right
 # 2. collision fcn now is capable of having as input another thing asides from the head pt, to detect danger zones
 # 3. explicit reset fcn created, with frame iteration count embedded
+# 4. positions are integer grid cells (pixels only show up when drawing), board size is configurable
+# 5. the frame loop runs on plain ints (SnakeCore), head/snake/food/direction are built on demand for the old API
 
-class SnakeGameAI:
+def action_index(action):
+    # one-hot [straight, right, left] like the agent makes them -> 0, 1, 2 (indices pass straight through)
+    if isinstance(action, (int, np.integer)):
+        return int(action)
+    if action[0]:
+        return 0
+    if action[1]:
+        return 1
+    return 2
 
-    def __init__(self, w=640, h=480):
-        self.w = w
-        self.h = h
-        # init diplay
-        self.display = pygame.display.set_mode((self.w,self.h))
-        pygame.display.set_caption('Snake')
-        self.clock = pygame.time.Clock()
-        self.reset()
+def check_board(cols, rows):
+    # a board the starting snake fits on, None = default size (for CLI values)
+    if cols is not None and cols < MIN_COLS:
+        raise ValueError('board needs at least %d columns, got %d' % (MIN_COLS, cols))
+    if rows is not None and rows < MIN_ROWS:
+        raise ValueError('board needs at least %d row, got %d' % (MIN_ROWS, rows))
+
+class SnakeCore:
+    # the game itself: head and food as ints, the body as a deque of cell indices (y*cols + x, head first)
+    # and a byte per cell for snake[1:], so a frame allocates close to nothing
+    __slots__ = ('cols', 'rows', 'frame_limit', 'rng', 'episode_seed', '_grid', 'body', 'hx', 'hy', 'dir',
+                 'food_cell', 'fx', 'fy', 'score', 'speed', 'frame_iteration')
+
+    def __init__(self, cols=640//BLOCK_SIZE, rows=480//BLOCK_SIZE, seed=None):
+        check_board(cols, rows)
+        self.cols = cols
+        self.rows = rows
+        # the step cap grows with the board, a snake needs longer to cross a big one
+        self.frame_limit = max(FRAMES_PER_SEGMENT, round(FRAMES_PER_SEGMENT*cols*rows/DEFAULT_CELLS))
+        # own RNG for the food, so games don't share the global random module with everything else;
+        # without a seed the first episode seed comes from the global one, so random.seed() still repeats runs
+        self.rng = random.Random()
+        self.fx = self.fy = 0
+        self.reset(seed if seed is not None else random.getrandbits(64))
+
+    def reset(self, seed=None):
+        # every episode is seeded (given, or drawn from the previous one's RNG), so the seed and the
+        # actions taken are enough to play it again exactly (see episode_trace)
+        self.episode_seed = seed if seed is not None else self.rng.getrandbits(64)
+        self.rng.seed(self.episode_seed)
+
+        # snake starts at the center going right, 2 blocks trailing on the left
+        self.dir = RIGHT
+        self.hx = self.cols//2
+        self.hy = self.rows//2
+        head = self.hy*self.cols + self.hx
+        self.body = deque((head, head-1, head-2))
+        self._grid = bytearray(self.cols*self.rows) # snake[1:] only, the head is checked against it
+        self._grid[head-1] = 1
+        self._grid[head-2] = 1
 
-    def reset(self):
-        # init game state
-        self.direction = Direction.RIGHT # direction of snake movement
-        
-        self.head = Point(self.w/2, self.h/2) # coord of snake head, starts at center of window
-        self.snake = [self.head,
-                      Point(self.head.x-BLOCK_SIZE,self.head.y), # tuple of block on snake
-                      Point(self.head.x-(2*BLOCK_SIZE),self.head.y)] # tuple of block end tail
-        
         self.score = 0 #starting with zero score
-        self.food = None # nothing eaten yet
         self.speed = SPEED
+        self.food_cell = -1 # nothing placed yet
         self._place_food() #call fcn to place food randomly
-        self.frame_iteration = 0 # frame iteration   
+        self.frame_iteration = 0 # frame iteration
 
     def _place_food(self):
-        x = random.randint(0,(self.w-BLOCK_SIZE)//BLOCK_SIZE)*BLOCK_SIZE # divide and multiply to get a random multiple of the block size
-        y = random.randint(0,(self.h-BLOCK_SIZE)//BLOCK_SIZE)*BLOCK_SIZE # divide and multiply to get a random multiple of the block size
-        self.food = Point(x,y)
-        # recursively put the food again if it happens  to be inside the snake
-        if self.food in self.snake: # check if tuple of food belongs to snake
+        # a few plain random draws first (cheap while the board is mostly empty)
+        cols = self.cols
+        grid = self._grid
+        head = self.hy*cols + self.hx
+        randint = self.rng.randint
+        for _ in range(FOOD_TRIES):
+            x = randint(0,cols-1)
+            y = randint(0,self.rows-1)
+            cell = y*cols + x
+            # draw again if it happens to be inside the snake
+            if not grid[cell] and cell != head:
+                self.food_cell = cell
+                self.fx = x
+                self.fy = y
+                return
+
+        # crowded board: sample straight from the free cells so this always finishes
+        free = [i for i in range(len(grid)) if not grid[i] and i != head]
+        if not free:
+            self.food_cell = -1 # snake fills the whole board, nothing left to eat
+            return
+        cell = self.rng.choice(free)
+        self.food_cell = cell
+        self.fx = cell % cols
+        self.fy = cell // cols
+
+    def step(self, a):
+        # one frame with action index a (0 straight, 1 right, 2 left), returns (reward, game_over, score)
+        self.frame_iteration += 1
+        d = (self.dir + TURNS[a]) & 3
+        self.dir = d
+        x = self.hx + DX[d]
+        y = self.hy + DY[d]
+        self.hx = x
+        self.hy = y
+        body = self.body
+        grid = self._grid
+        grid[body[0]] = 1 # old head is body now
+        cell = y*self.cols + x
+        body.appendleft(cell) # out of the board too, the head slot is read through hx/hy
+
+        # game over: wall, own body (tail included, it has not moved yet) or too long without progress
+        if x < 0 or x >= self.cols or y < 0 or y >= self.rows or grid[cell] or \
+           self.frame_iteration > self.frame_limit*len(body):
+            return -10, True, self.score
+
+        if cell == self.food_cell:
+            self.score += 1
+            self.speed += 1 #goes a bit faster every time
             self._place_food()
+            return 10, self.food_cell < 0, self.score # a full board ends the game
+        grid[body.pop()] = 0 # tail moves on
+        return 0, False, self.score
+
+class SnakeGameAI(SnakeCore):
+    # SnakeCore plus the window, and the Point/Direction API the rest of the project grew up with
+
+    def __init__(self, w=640, h=480, render=True, cols=None, rows=None, seed=None):
+        # board is cols x rows cells, by default as many BLOCK_SIZE cells as fit in w x h pixels
+        cols = cols if cols is not None else w // BLOCK_SIZE
+        rows = rows if rows is not None else h // BLOCK_SIZE
+        check_board(cols, rows)
+        self.block = max(1, min(BLOCK_SIZE, MAX_WINDOW[0]//cols, MAX_WINDOW[1]//rows)) # pixels per cell
+        self.w = cols*self.block # window size in pixels
+        self.h = rows*self.block
+        self.render = render # False = headless: no window, events, drawing or clock throttling
+        self.display = None
+        self.clock = None
+        SnakeCore.__init__(self, cols, rows, seed)
+        if self.render:
+            self._init_display()
+
+    def _init_display(self):
+        # init diplay
+        _load_pygame()
+        self.display = pygame.display.set_mode((self.w,self.h))
+        pygame.display.set_caption('Snake')
+        self.clock = pygame.time.Clock()
+
+    def set_render(self, render):
+        # switch rendering on/off between episodes (e.g. watch every Nth game)
+        if render and self.display is None:
+            self._init_display() # window only gets created the first time we need it
+        self.render = render
 
     def play_step(self, action):
-        self.frame_iteration += 1
-        # 1. collect user input
+        # action one-hot [straight, right, left] or its index
+        # 1. collect user input (only when there is a window to get it from)
+        if self.render:
+            self._handle_events()
+
+        # 2. move, check game over, eat or move the tail
+        reward, game_over, score = self.step(action if action.__class__ is int else action_index(action))
+
+        # 3. update UI and clock (headless skips both, game logic is the same)
+        if self.render and not game_over:
+            self._update_ui()
+            self.clock.tick(self.speed) #controls how fast frame updates
+
+        return reward, game_over, score
+
+    # the old object API, built on demand from the ints (nothing in the frame loop uses these)
+    @property
+    def head(self):
+        return Point(self.hx, self.hy)
+
+    @property
+    def snake(self):
+        cols = self.cols
+        return [Point(self.hx, self.hy)] + [Point(c % cols, c // cols) for c in islice(self.body, 1, None)]
+
+    @property
+    def food(self):
+        return Point(self.fx, self.fy) if self.food_cell >= 0 else None
+
+    @property
+    def direction(self):
+        return DIRECTIONS[self.dir]
+
+    @direction.setter
+    def direction(self, direction):
+        self.dir = DIRECTION_CODE[direction]
+
+    def _cell(self, pt):
+        # grid index of a cell, only valid for points inside the board
+        return pt.y*self.cols + pt.x
+
+    def _handle_events(self):
         for event  in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -81,101 +255,42 @@ class SnakeGameAI:
                 elif event.key == pygame.K_DOWN:
                     self.direction = Direction.DOWN
 
-        # 2. move snake with AI action
-        self._move(action) #updates the head
-        self.snake.insert(0,self.head) # adds at the beginning (place 0) the new head location, NOT APPEND BECAUSE THEN IT PUTS IT LAST
-
-        # 3. check if game over
-        game_over = False
-        reward = 0
-        if self.is_collision() or self.frame_iteration > 100*len(self.snake):
-            game_over = True
-            reward = -10
-            return reward, game_over, self.score
-
-        # 4. place new food or just move snake
-        if self.head == self.food:
-            self.score += 1
-            self.speed += 1 #goes a bit faster every time
-            reward = 10
-            self._place_food()
-        else:
-            self.snake.pop() # removes the last element of snake 'moves it'
-        
-
-        # 5. update UI and clock
-        self._update_ui()
-        self.clock.tick(self.speed) #controls how fast frame updates
-
-        # 6. return if game over and score
-        return reward, game_over, self.score
-    
     def is_collision(self, pt=None):
         if pt is None:
             pt = self.head
 
         # check if hits boundary
-        if pt.x > self.w - BLOCK_SIZE or pt.x < 0 or \
-           pt.y > self.h - BLOCK_SIZE or pt.y < 0:
+        if pt.x >= self.cols or pt.x < 0 or \
+           pt.y >= self.rows or pt.y < 0:
             return True
         #check if hits self
-        if pt in self.snake[1:]: # start with 1 because 0 is the head
+        if self._grid[self._cell(pt)]: # grid only holds snake[1:], 0 is the head
             return True
         # if nothing happens return false
         return False
-    
+
     def _update_ui(self):
         self.display.fill(BLACK) # fill window with black first
 
-        # draw block by block the snake
+        # draw block by block the snake (cells -> pixels here and only here)
+        b = self.block
+        edge = b*BEDGE//BLOCK_SIZE
         for pt in self.snake:
-            pygame.draw.rect(self.display, BLUE1, pygame.Rect(pt.x,pt.y,BLOCK_SIZE,BLOCK_SIZE))
-            pygame.draw.rect(self.display, BLUE2, pygame.Rect(pt.x+BEDGE,pt.y+BEDGE,BLOCK_SIZE-2*BEDGE,BLOCK_SIZE-2*BEDGE))
+            pygame.draw.rect(self.display, BLUE1, pygame.Rect(pt.x*b,pt.y*b,b,b))
+            if edge:
+                pygame.draw.rect(self.display, BLUE2, pygame.Rect(pt.x*b+edge,pt.y*b+edge,b-2*edge,b-2*edge))
         
         # draw the food
-        pygame.draw.rect(self.display,RED,pygame.Rect(self.food.x,self.food.y, BLOCK_SIZE,BLOCK_SIZE))
+        pygame.draw.rect(self.display,RED,pygame.Rect(self.food.x*b,self.food.y*b, b,b))
 
         # display the score
+        global font
+        if font is None:
+            font = pygame.font.Font('arial.ttf',25) # much faster to get font from ttf than from system
         text = font.render("Score: " + str(self.score),True, WHITE)
         self.display.blit(text,[0,0])
         pygame.display.flip() # sends change to screen
 
-    def _move(self, action): # input comes from AI not person
-        #actions are [straight, right, left]
-        # straight = [1,0,0]
-        # right    = [0,1,0]
-        # left     = [0,0,1]
-
-        # set up clockwise convention right, down, up, left
-        clock_wise = [Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP]
-        idx = clock_wise.index(self.direction) # gets index of current direction
-
-        # get new direction depending on action
-        if np.array_equal(action,[1,0,0]): # straight
-            new_dir = clock_wise[idx]
-        elif np.array_equal(action,[0,1,0]): # right turn
-            new_idx = (idx+1)%4 # find the next index clockwise
-            new_dir = clock_wise[new_idx] 
-        else: #[0,0,1] left turn
-            new_idx = (idx-1)%4 # find next index counterclockwise
-            new_dir = clock_wise[new_idx]
-
-        self.direction = new_dir
-
-        x = self.head.x
-        y = self.head.y
-
-        if self.direction == Direction.RIGHT:
-            x += BLOCK_SIZE
-        elif self.direction == Direction.LEFT:
-            x -= BLOCK_SIZE
-        elif self.direction == Direction.DOWN:
-            y += BLOCK_SIZE
-        elif self.direction == Direction.UP:
-            y -= BLOCK_SIZE
-
-        self.head = Point(x,y)
-
 
 
 # no longer needed because the script will be called by something else.
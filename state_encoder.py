@@ -0,0 +1,134 @@
+import time
+import numpy as np
+from snake_gameAI import SnakeGameAI, Direction, DIRECTION_CODE, DX, DY
+
+# the 11 agent features straight from the occupancy grid, no Points and no is_collision calls:
+# danger straight, right, left,
+# direction left, right, up, down
+# food left, right, up, down
+STATE_SIZE = 11
+
+# clockwise convention right, down, left, up (the direction codes of SnakeCore)
+DIRECTION_INDEX = DIRECTION_CODE
+DIR_DELTAS = tuple(zip(DX, DY))
+# cells to check for danger straight, right (clockwise) and left (counterclockwise) of each direction
+DANGER_DELTAS = tuple((DIR_DELTAS[d], DIR_DELTAS[(d+1)%4], DIR_DELTAS[(d-1)%4]) for d in range(4))
+DANGER_DIRS = np.array([[d, (d+1)%4, (d-1)%4] for d in range(4)])
+# direction features (left, right, up, down) for every direction index
+DIR_FEATURES = np.array([[0,1,0,0], [0,0,0,1], [1,0,0,0], [0,0,1,0]], dtype=np.float32)
+DIR_TUPLES = tuple(tuple(row) for row in DIR_FEATURES.tolist())
+NP_DELTAS = np.array(DIR_DELTAS)
+# the 11 features are all 0/1, so a whole state fits in the low 11 bits of an integer (feature i -> bit i)
+PACK_BITS = np.arange(STATE_SIZE, dtype=np.uint16)
+PACK_WEIGHTS = (1 << PACK_BITS).astype(np.uint16)
+
+class StateEncoder:
+
+    def __init__(self):
+        self.buffer = np.zeros(STATE_SIZE, dtype=np.float32) # reused when no out buffer is given
+        self.batch_buffer = None
+
+    def encode(self, game, out=None):
+        # one SnakeGameAI, written into out (or the encoder's own buffer, which the next call overwrites)
+        if out is None:
+            out = self.buffer
+        # plain ints of the game core, no Point/Direction objects
+        d = game.dir
+        grid = game._grid
+        cols = game.cols
+        rows = game.rows
+        cx = game.hx
+        cy = game.hy
+        fx = game.fx
+        fy = game.fy
+
+        # danger = wall or body (the grid holds snake[1:]) on the cell next to the head
+        (sdx, sdy), (rdx, rdy), (ldx, ldy) = DANGER_DELTAS[d]
+        sx, sy = cx + sdx, cy + sdy # straight
+        rx, ry = cx + rdx, cy + rdy # right
+        lx, ly = cx + ldx, cy + ldy # left
+
+        # everything goes into the buffer in one assignment, per-element numpy writes are slow
+        out[:] = (
+            sx < 0 or sx >= cols or sy < 0 or sy >= rows or grid[sy*cols + sx], # danger straight
+            rx < 0 or rx >= cols or ry < 0 or ry >= rows or grid[ry*cols + rx], # danger right
+            lx < 0 or lx >= cols or ly < 0 or ly >= rows or grid[ly*cols + lx], # danger left
+            *DIR_TUPLES[d],
+            fx < cx, # food is on the left
+            fx > cx, # food is on the right
+            fy < cy, # food is upwards
+            fy > cy, # food is downwards
+        )
+        return out
+
+    def encode_snapshot(self, snake, food, direction, cols, rows, out=None):
+        # a raw board from outside (e.g. a policy service client): snake cells head first, food cell,
+        # direction as index (clockwise from right) or name, same 11 features as encode
+        if out is None:
+            out = self.buffer
+        d = direction if isinstance(direction, int) else DIRECTION_INDEX[Direction[direction]]
+        if not 0 <= d < 4:
+            raise ValueError('direction index goes from 0 to 3, got %d' % d)
+        cx, cy = snake[0]
+        fx, fy = food
+        body = set(map(tuple, snake[1:]))
+        danger = []
+        for dx, dy in DANGER_DELTAS[d]:
+            x, y = cx + dx, cy + dy
+            danger.append(x < 0 or x >= cols or y < 0 or y >= rows or (x, y) in body)
+        out[:] = (*danger, *DIR_TUPLES[d], fx < cx, fx > cx, fy < cy, fy > cy)
+        return out
+
+    def encode_batch(self, env, out=None):
+        # every game of a VectorSnakeEnv at once, returns an (N, 11) float32 array
+        if out is None:
+            if self.batch_buffer is None or len(self.batch_buffer) != env.n:
+                self.batch_buffer = np.zeros((env.n, STATE_SIZE), dtype=np.float32)
+            out = self.batch_buffer
+
+        hx = env.head[:,0]
+        hy = env.head[:,1]
+        dirs = DANGER_DIRS[env.direction] # (N, 3) directions to look at
+        x = hx[:,None] + NP_DELTAS[dirs,0]
+        y = hy[:,None] + NP_DELTAS[dirs,1]
+        wall = (x < 0) | (x >= env.cols) | (y < 0) | (y >= env.rows)
+        # clip so the lookup stays in bounds, the wall mask already covers those cells
+        body = env.occupied[np.arange(env.n)[:,None], np.clip(y, 0, env.rows-1), np.clip(x, 0, env.cols-1)]
+        out[:,0:3] = wall | body
+
+        out[:,3:7] = DIR_FEATURES[env.direction]
+        out[:,7] = env.food[:,0] < hx
+        out[:,8] = env.food[:,0] > hx
+        out[:,9] = env.food[:,1] < hy
+        out[:,10] = env.food[:,1] > hy
+        return out
+
+def pack_states(states):
+    # (N, 11) or (11,) of 0/1 -> uint16 per state
+    return (np.asarray(states) != 0).astype(np.uint16) @ PACK_WEIGHTS
+
+def unpack_states(packed):
+    # uint16 per state -> (N, 11) uint8 of 0/1
+    return ((np.asarray(packed, dtype=np.uint16)[..., None] >> PACK_BITS) & 1).astype(np.uint8)
+
+def measure(n_calls=100_000, n_envs=256, n_batches=2_000):
+    # encoder throughput in states per second, single game and batched
+    encoder = StateEncoder()
+    game = SnakeGameAI(render=False)
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        encoder.encode(game)
+    single = n_calls / (time.perf_counter() - t0)
+
+    from vector_env import VectorSnakeEnv
+    env = VectorSnakeEnv(n_envs, seed=0)
+    t0 = time.perf_counter()
+    for _ in range(n_batches):
+        encoder.encode_batch(env)
+    batched = n_envs * n_batches / (time.perf_counter() - t0)
+    return single, batched
+
+if __name__ == '__main__':
+    single, batched = measure()
+    print('encode       %.0f states/s' % single)
+    print('encode_batch %.0f states/s' % batched)
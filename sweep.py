@@ -0,0 +1,171 @@
+import argparse
+import contextlib
+import csv
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from snake_gameAI import check_board
+
+# hyperparameter sweep: every config is a headless training run in its own process (pinned to its own cores),
+# trials that fall behind the others get stopped early, every finished trial becomes a row in one results table
+RESULTS_FILE = './model/sweep.csv'
+N_GAMES = 300 # games per trial
+PRUNE_EVERY = 50 # games between pruning checks
+PRUNE_WARMUP = 100 # no pruning before this many games (epsilon is still high, scores say little)
+PRUNE_MIN_TRIALS = 3 # trials that must have reached a check before anyone gets pruned there
+PRUNE_QUANTILE = 0.5 # pruned when the window mean is below this quantile of the others at the same check
+
+_threads = 1 # per worker process
+
+def _init_worker(next_core, threads):
+    # every worker takes the next `threads` cores, so trials don't fight over the same ones
+    global _threads
+    import torch
+    _threads = threads
+    torch.set_num_threads(threads)
+    if hasattr(os, 'sched_setaffinity'): # linux only, elsewhere the OS decides
+        cores = sorted(os.sched_getaffinity(0))
+        with next_core.get_lock():
+            first = next_core.value
+            next_core.value += threads
+        os.sched_setaffinity(0, {cores[(first + i) % len(cores)] for i in range(threads)})
+
+class MedianPruner:
+    # shared between trials through a manager dict: '<games>:<trial>' -> window mean at that check
+
+    def __init__(self, shared, lock, trial, every=PRUNE_EVERY, warmup=PRUNE_WARMUP, min_trials=PRUNE_MIN_TRIALS,
+                 quantile=PRUNE_QUANTILE):
+        self.shared = shared
+        self.lock = lock
+        self.trial = trial
+        self.every = every
+        self.warmup = warmup
+        self.min_trials = min_trials
+        self.quantile = quantile
+        self.pruned_at = None
+
+    def __call__(self, n_games, window_mean):
+        if n_games < self.warmup or n_games % self.every:
+            return False
+        prefix = '%d:' % n_games
+        with self.lock:
+            self.shared['%d:%d' % (n_games, self.trial)] = window_mean
+            others = [v for k, v in self.shared.items() if k.startswith(prefix) and k != '%d:%d' % (n_games, self.trial)]
+        if len(others) + 1 < self.min_trials:
+            return False
+        if window_mean < np.quantile(others, self.quantile):
+            self.pruned_at = n_games
+            return True
+        return False
+
+def run_trial(trial, config, n_games, seed, shared, lock, train_kwargs):
+    # one headless training run, its print output swallowed, returns a results row
+    from agent import train
+    import torch
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    pruner = MedianPruner(shared, lock, trial) if shared is not None else None
+    scores = []
+
+    def stop_when(games, window_mean):
+        scores.append(window_mean)
+        return pruner is not None and games < n_games and pruner(games, window_mean) # the last game is no saving
+
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        agent = train(render=False, max_games=n_games, live_plot=False, save_model=False, hyperparams=config,
+                      stop_when=stop_when, **train_kwargs)
+    row = {'trial': trial}
+    row.update(config)
+    row.update({'games': agent.n_games, 'window_mean': round(scores[-1], 3) if scores else 0.0,
+                'best_window_mean': round(max(scores), 3) if scores else 0.0,
+                'pruned_at': pruner.pruned_at if pruner is not None and pruner.pruned_at else '',
+                'seconds': round(time.perf_counter() - t0, 1), 'threads': _threads})
+    return row
+
+def parse_space(specs):
+    # ['lr=0.001,0.0005', 'hidden_size=128,256'] -> {'lr': [0.001, 0.0005], 'hidden_size': [128, 256]}
+    from agent import parse_number, check_hparams
+    space = {}
+    for spec in specs:
+        if '=' not in spec:
+            raise ValueError('expected NAME=V1,V2,..., got %r' % spec)
+        name, values = spec.split('=', 1)
+        space[name.strip()] = [parse_number(v.strip()) for v in values.split(',')]
+    check_hparams(space) # before any worker starts, a bad name would fail every trial
+    return space
+
+def grid(space, samples=None, seed=0):
+    # every combination, or a random subset of samples of them
+    names = list(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if samples is not None and samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+    return configs
+
+def sweep(configs, n_games=N_GAMES, workers=None, threads=1, seed=0, prune=True, results_path=RESULTS_FILE,
+          **train_kwargs):
+    # runs every config, writes rows to results_path as trials finish, returns the rows best first
+    from agent import check_hparams
+    for config in configs:
+        check_hparams(config)
+    workers = workers or max(1, os.cpu_count() // threads)
+    ctx = mp.get_context('spawn')
+    manager = ctx.Manager() if prune else None
+    shared = manager.dict() if prune else None
+    lock = manager.Lock() if prune else None
+    next_core = ctx.Value('i', 0)
+    columns = ['trial'] + sorted({k for c in configs for k in c}) + ['games', 'window_mean', 'best_window_mean',
+                                                                      'pruned_at', 'seconds', 'threads']
+    os.makedirs(os.path.dirname(results_path) or '.', exist_ok=True)
+    rows = []
+    try:
+        with open(results_path, 'w', newline='') as f, \
+             ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(next_core, threads)) as pool:
+            writer = csv.DictWriter(f, columns)
+            writer.writeheader()
+            futures = [pool.submit(run_trial, i, config, n_games, seed + i, shared, lock, train_kwargs)
+                       for i, config in enumerate(configs)]
+            for future in as_completed(futures):
+                row = future.result()
+                writer.writerow(row)
+                f.flush() # a killed sweep keeps what it finished
+                rows.append(row)
+                print('trial %3d  %-50s games %4d  window mean %6.2f%s' % (
+                    row['trial'], ' '.join('%s=%s' % (k, row[k]) for k in columns[1:-6]), row['games'],
+                    row['window_mean'], '  (pruned)' if row['pruned_at'] != '' else ''), flush=True)
+    finally:
+        if manager is not None:
+            manager.shutdown()
+    return sorted(rows, key=lambda r: -r['window_mean'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='hyperparameter sweep over headless training runs')
+    parser.add_argument('params', nargs='+', metavar='NAME=V1,V2,...',
+                        help='values to try (lr, gamma, batch_size, max_memory, hidden_size, eps_start, eps_decay)')
+    parser.add_argument('--games', type=int, default=N_GAMES, help='games per trial')
+    parser.add_argument('--samples', type=int, default=None, help='random subset of the grid instead of all of it')
+    parser.add_argument('--workers', type=int, default=None, help='trials at once (default: cores / threads)')
+    parser.add_argument('--threads', type=int, default=1, help='torch threads (and pinned cores) per trial')
+    parser.add_argument('--seed', type=int, default=0, help='trial i is seeded with seed+i')
+    parser.add_argument('--no-prune', action='store_true', help='run every trial to the end')
+    parser.add_argument('--results', default=RESULTS_FILE, help='CSV table of all trials')
+    parser.add_argument('--cols', type=int, default=None, help='board width in cells (default 32)')
+    parser.add_argument('--rows', type=int, default=None, help='board height in cells (default 24)')
+    args = parser.parse_args()
+    try:
+        check_board(args.cols, args.rows)
+        space = parse_space(args.params)
+    except ValueError as e:
+        parser.error(str(e))
+
+    configs = grid(space, args.samples, args.seed)
+    print('%d trials, %d games each' % (len(configs), args.games))
+    rows = sweep(configs, args.games, args.workers, args.threads, args.seed, not args.no_prune, args.results,
+                 cols=args.cols, rows=args.rows)
+    print('\nbest: trial %d, window mean %.2f  (%s)' % (rows[0]['trial'], rows[0]['window_mean'], args.results))
@@ -0,0 +1,132 @@
+import glob
+import os
+import numpy as np
+from state_encoder import pack_states, unpack_states
+
+# append-only binary log of transitions, split in chunk files of fixed-width records:
+#   state, next_state : uint16, the 11 features packed as bits
+#   action            : uint8, index of the move (0 straight, 1 right, 2 left)
+#   reward            : float32
+#   game_over         : uint8
+# every chunk starts with a 16 byte header (magic + record size), readers memory-map the records after it
+RECORD_DTYPE = np.dtype([('state', '<u2'), ('next_state', '<u2'), ('action', 'u1'),
+                         ('reward', '<f4'), ('game_over', 'u1')]) # 10 bytes, no padding
+MAGIC = b'SNKTLOG1'
+HEADER_SIZE = 16
+CHUNK_RECORDS = 1_000_000 # records per chunk file (10 MB)
+FLUSH_EVERY = 4096 # records buffered in memory before they hit the file
+
+def _header():
+    header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+    header[:8] = np.frombuffer(MAGIC, dtype=np.uint8)
+    header[8:12] = np.frombuffer(np.uint32(RECORD_DTYPE.itemsize).tobytes(), dtype=np.uint8)
+    return header.tobytes()
+
+def list_chunks(folder):
+    return sorted(glob.glob(os.path.join(folder, 'chunk_*.bin')))
+
+class TransitionLogWriter:
+
+    def __init__(self, folder, chunk_records=CHUNK_RECORDS, flush_every=FLUSH_EVERY):
+        # existing chunks are left alone, a new writer always starts a fresh chunk
+        self.folder = folder
+        self.chunk_records = chunk_records
+        os.makedirs(folder, exist_ok=True)
+        self.chunk_index = len(list_chunks(folder))
+        self.in_chunk = 0
+        self._file = None
+        self._pending = np.zeros(flush_every, dtype=RECORD_DTYPE)
+        self._n_pending = 0
+
+    def append(self, state, action, reward, next_state, game_over):
+        # one transition, action as one-hot (like the agent uses) or as an index
+        rec = self._pending[self._n_pending]
+        rec['state'] = pack_states(state)
+        rec['next_state'] = pack_states(next_state)
+        rec['action'] = np.argmax(action) if np.ndim(action) else action
+        rec['reward'] = reward
+        rec['game_over'] = game_over
+        self._n_pending += 1
+        if self._n_pending == len(self._pending):
+            self.flush()
+
+    def append_batch(self, states, actions, rewards, next_states, game_overs):
+        # many transitions, actions as indices
+        self.flush()
+        records = np.zeros(len(rewards), dtype=RECORD_DTYPE)
+        records['state'] = pack_states(states)
+        records['next_state'] = pack_states(next_states)
+        records['action'] = actions
+        records['reward'] = rewards
+        records['game_over'] = game_overs
+        self._write(records)
+
+    def flush(self):
+        if self._n_pending:
+            self._write(self._pending[:self._n_pending])
+            self._n_pending = 0
+        if self._file is not None:
+            self._file.flush()
+
+    def _write(self, records):
+        # fill up the current chunk, open the next one when it is full
+        while len(records):
+            if self._file is None:
+                path = os.path.join(self.folder, 'chunk_%06d.bin' % self.chunk_index)
+                self._file = open(path, 'ab')
+                self._file.write(_header())
+                self.in_chunk = 0
+            n = min(len(records), self.chunk_records - self.in_chunk)
+            self._file.write(records[:n].tobytes())
+            self.in_chunk += n
+            records = records[n:]
+            if self.in_chunk == self.chunk_records:
+                self._file.close()
+                self._file = None
+                self.chunk_index += 1
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class TransitionLog:
+
+    def __init__(self, folder):
+        # memory-maps every chunk, nothing gets read until records are asked for
+        self.folder = folder
+        self.chunks = []
+        for path in list_chunks(folder):
+            n = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize # a torn last write is ignored
+            if n <= 0:
+                continue
+            with open(path, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+            if header[:8] != MAGIC:
+                raise ValueError('%s is not a transition log chunk' % path)
+            self.chunks.append(np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(n,)))
+        self.starts = np.cumsum([0] + [len(c) for c in self.chunks])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def records(self, idx):
+        # records at global positions idx (any order), only the pages they live on get read
+        idx = np.asarray(idx, dtype=np.int64)
+        out = np.empty(len(idx), dtype=RECORD_DTYPE)
+        chunk_of = np.searchsorted(self.starts, idx, side='right') - 1
+        for c in np.unique(chunk_of):
+            mask = chunk_of == c
+            out[mask] = self.chunks[c][idx[mask] - self.starts[c]]
+        return out
+
+    def tail(self, n):
+        # the n newest records, oldest first
+        n = min(n, len(self))
+        return self.records(np.arange(len(self) - n, len(self)))
+
+def unpack_records(records):
+    # records -> (states, actions, rewards, next_states, game_overs) numpy arrays, the replay buffer layout
+    return (unpack_states(records['state']), records['action'].astype(np.int8), records['reward'].astype(np.float32),
+            unpack_states(records['next_state']), records['game_over'].astype(bool))
@@ -0,0 +1,146 @@
+import numpy as np
+from snake_gameAI import BLOCK_SIZE, FRAMES_PER_SEGMENT, DEFAULT_CELLS, FOOD_TRIES, DX, DY, check_board
+
+# same rules as SnakeGameAI, but N games live in numpy arrays and get stepped together
+# positions are grid cells (x, y), same as SnakeGameAI
+
+# clockwise convention right, down, left, up (the direction codes of SnakeCore, built from its DX/DY)
+DIR_DELTAS = np.array(list(zip(DX, DY)), dtype=np.int64)
+# action index -> turn: straight, right (clockwise), left (counterclockwise)
+ACTION_TURNS = np.array([0,1,-1], dtype=np.int64)
+
+class VectorSnakeEnv:
+
+    def __init__(self, n_envs, w=640, h=480, seed=None, cols=None, rows=None):
+        self.n = n_envs
+        self.cols = cols if cols is not None else w // BLOCK_SIZE
+        self.rows = rows if rows is not None else h // BLOCK_SIZE
+        check_board(self.cols, self.rows)
+        self.n_cells = self.cols * self.rows
+        self.frame_limit = max(FRAMES_PER_SEGMENT, round(FRAMES_PER_SEGMENT*self.n_cells/DEFAULT_CELLS))
+        self.rng = np.random.default_rng(seed)
+
+        # body is a ring buffer per game, head sits at head_ptr and the tail length-1 slots behind
+        self.body = np.zeros((self.n, self.n_cells, 2), dtype=np.int64)
+        self.head_ptr = np.zeros(self.n, dtype=np.int64)
+        self.length = np.zeros(self.n, dtype=np.int64)
+        self.occupied = np.zeros((self.n, self.rows, self.cols), dtype=bool) # every body cell, head included
+
+        self.head = np.zeros((self.n, 2), dtype=np.int64)
+        self.direction = np.zeros(self.n, dtype=np.int64) # index into DIR_DELTAS
+        self.food = np.zeros((self.n, 2), dtype=np.int64)
+        self.score = np.zeros(self.n, dtype=np.int64)
+        self.frame_iteration = np.zeros(self.n, dtype=np.int64)
+
+        self._all = np.arange(self.n)
+        self.reset()
+
+    def reset(self, idx=None):
+        # reset all games, or only the ones in idx (bool mask or index array)
+        idx = self._all if idx is None else np.asarray(idx)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        if len(idx) == 0:
+            return
+
+        self.occupied[idx] = False
+        self.direction[idx] = 0 # start going right
+        self.score[idx] = 0
+        self.frame_iteration[idx] = 0
+        self.length[idx] = 3
+        self.head_ptr[idx] = 2
+
+        # snake starts at the center with 2 blocks trailing on the left, like SnakeGameAI
+        cx, cy = self.cols // 2, self.rows // 2
+        for k in range(3):
+            self.body[idx, k, 0] = cx - (2 - k)
+            self.body[idx, k, 1] = cy
+            self.occupied[idx, cy, cx - (2 - k)] = True
+        self.head[idx, 0] = cx
+        self.head[idx, 1] = cy
+
+        self._place_food(idx)
+
+    def _place_food(self, idx):
+        # a few random draws per game first, they cost the same on any board size
+        # returns the games of idx with no free cell left (snake fills the board), their food is not moved
+        idx = np.asarray(idx)
+        flat = self.occupied.reshape(self.n, -1)
+        for _ in range(FOOD_TRIES):
+            cell = self.rng.integers(0, self.n_cells, len(idx))
+            free = ~flat[idx, cell]
+            self.food[idx[free], 0] = cell[free] % self.cols
+            self.food[idx[free], 1] = cell[free] // self.cols
+            idx = idx[~free]
+            if len(idx) == 0:
+                return idx
+
+        # crowded boards: random keys on the free cells, occupied ones masked out
+        taken = flat[idx]
+        full = taken.all(axis=1)
+        keys = self.rng.random((len(idx), self.n_cells))
+        keys[taken] = -1.0
+        cell = keys.argmax(axis=1)[~full]
+        self.food[idx[~full], 0] = cell % self.cols
+        self.food[idx[~full], 1] = cell // self.cols
+        return idx[full]
+
+    def step(self, actions):
+        # actions are indices (N,) with 0 straight, 1 right, 2 left, or one-hot (N,3) like the agent uses
+        actions = np.asarray(actions)
+        if actions.ndim == 2:
+            actions = actions.argmax(axis=1)
+
+        self.frame_iteration += 1
+        rewards = np.zeros(self.n, dtype=np.float32)
+
+        # 1. move the heads
+        self.direction = (self.direction + ACTION_TURNS[actions]) % 4
+        new_head = self.head + DIR_DELTAS[self.direction]
+        x, y = new_head[:,0], new_head[:,1]
+
+        # 2. check game over: wall, any body cell (tail included, it has not moved yet) or too many frames
+        out = (x < 0) | (x >= self.cols) | (y < 0) | (y >= self.rows)
+        hit = np.zeros(self.n, dtype=bool)
+        inside = ~out
+        hit[inside] = self.occupied[inside, y[inside], x[inside]]
+        dones = out | hit | (self.frame_iteration > self.frame_limit * (self.length + 1))
+        rewards[dones] = -10
+        scores = self.score.copy() # score at the end of this step, before finished games get reset
+
+        # 3. advance the games that are still alive
+        alive = np.flatnonzero(~dones)
+        hx, hy = x[alive], y[alive]
+        ptr = (self.head_ptr[alive] + 1) % self.n_cells
+        self.head_ptr[alive] = ptr
+        self.body[alive, ptr, 0] = hx
+        self.body[alive, ptr, 1] = hy
+        self.occupied[alive, hy, hx] = True
+        self.head[alive] = new_head[alive]
+
+        ate = (hx == self.food[alive,0]) & (hy == self.food[alive,1])
+        eaters = alive[ate]
+        self.score[eaters] += 1
+        scores[eaters] += 1
+        rewards[eaters] = 10
+        self.length[eaters] += 1
+
+        # everyone who did not eat drops its tail
+        movers = alive[~ate]
+        tail = (self.head_ptr[movers] - self.length[movers]) % self.n_cells
+        tx = self.body[movers, tail, 0]
+        ty = self.body[movers, tail, 1]
+        self.occupied[movers, ty, tx] = False
+
+        if len(eaters):
+            dones[self._place_food(eaters)] = True # a full board ends the game, like SnakeCore
+
+        # 4. finished games start over straight away
+        self.reset(np.flatnonzero(dones))
+
+        return rewards, dones, scores
+
+    def snake(self, i):
+        # body of game i as a list of (x, y) cells, head first (handy for debugging/rendering)
+        ptr = self.head_ptr[i]
+        return [tuple(self.body[i, (ptr - k) % self.n_cells]) for k in range(self.length[i])]